@@ -0,0 +1,244 @@
+from collections import OrderedDict
+import os
+import threading
+import time
+
+from helpers.importHelpers import lazyImport
+from helpers.logHelpers import createLog
+
+sqlite3 = lazyImport('sqlite3')
+
+logger = createLog('cacheHelpers')
+
+
+class LRUCache():
+    """In-process cache with least-recently-used eviction and an optional
+    time-to-live for entries. As this lives at the module level it persists
+    across warm invocations of the Lambda. Safe to share between threads."""
+    def __init__(self, maxSize=256, ttl=None):
+        self.maxSize = maxSize
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, key, default=None):
+        """Return the cached value for a key, or the default if the key is
+        missing or its entry has expired"""
+        entry = self.getEntry(key)
+        return entry[1] if entry is not None else default
+
+    def getEntry(self, key):
+        """Return a tuple of the expiry time and value cached for a key, or
+        None if the key is missing or its entry has expired"""
+        with self.lock:
+            try:
+                expires, value = self.entries[key]
+            except KeyError:
+                self.misses += 1
+                return None
+
+            if expires is not None and expires < time.time():
+                del self.entries[key]
+                self.misses += 1
+                return None
+
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return expires, value
+
+    def set(self, key, value, ttl=None):
+        """Store a value, evicting the least recently used entries if the
+        cache is over its maximum size. A ttl passed here overrides the
+        default ttl of the cache for this entry only"""
+        ttl = ttl if ttl is not None else self.ttl
+        expires = time.time() + ttl if ttl is not None else None
+        with self.lock:
+            self.entries[key] = (expires, value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.maxSize:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.hits = 0
+            self.misses = 0
+            self.evictions = 0
+
+    def stats(self):
+        return {
+            'size': len(self.entries),
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions
+        }
+
+
+class SQLiteCache():
+    """On-disk cache of string values backed by a SQLite file, generally
+    stored under /tmp so that it persists for the life of a Lambda container.
+    Entries expire after the ttl and the least recently accessed entries are
+    removed once the cache exceeds its maximum size."""
+    def __init__(self, path, maxSize=10000, ttl=None):
+        self.path = path
+        self.maxSize = maxSize
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute(
+            'CREATE TABLE IF NOT EXISTS cache ('
+            'key TEXT PRIMARY KEY, value TEXT, expires REAL, accessed REAL)'
+        )
+        self.conn.commit()
+
+    def __len__(self):
+        with self.lock:
+            return self.conn.execute('SELECT COUNT(*) FROM cache').fetchone()[0]
+
+    def get(self, key, default=None):
+        entry = self.getEntry(key)
+        return entry[1] if entry is not None else default
+
+    def getEntry(self, key):
+        """Return a tuple of the expiry time and value cached for a key, or
+        None if the key is missing or its entry has expired"""
+        now = time.time()
+        with self.lock:
+            row = self.conn.execute(
+                'SELECT value, expires FROM cache WHERE key = ?', (key,)
+            ).fetchone()
+
+            if row is None:
+                self.misses += 1
+                return None
+
+            value, expires = row
+            if expires is not None and expires < now:
+                self.conn.execute('DELETE FROM cache WHERE key = ?', (key,))
+                self.conn.commit()
+                self.misses += 1
+                return None
+
+            self.conn.execute(
+                'UPDATE cache SET accessed = ? WHERE key = ?', (now, key)
+            )
+            self.conn.commit()
+            self.hits += 1
+            return expires, value
+
+    def set(self, key, value, ttl=None):
+        now = time.time()
+        ttl = ttl if ttl is not None else self.ttl
+        expires = now + ttl if ttl is not None else None
+        with self.lock:
+            self.conn.execute(
+                'INSERT OR REPLACE INTO cache VALUES (?, ?, ?, ?)',
+                (key, value, expires, now)
+            )
+            overSize = self.conn.execute(
+                'SELECT COUNT(*) FROM cache'
+            ).fetchone()[0] - self.maxSize
+            if overSize > 0:
+                self.conn.execute(
+                    'DELETE FROM cache WHERE key IN ('
+                    'SELECT key FROM cache ORDER BY accessed ASC LIMIT ?)',
+                    (overSize,)
+                )
+                self.evictions += overSize
+            self.conn.commit()
+
+    def clear(self):
+        with self.lock:
+            self.conn.execute('DELETE FROM cache')
+            self.conn.commit()
+            self.hits = 0
+            self.misses = 0
+            self.evictions = 0
+
+    def stats(self):
+        return {
+            'size': len(self),
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions
+        }
+
+
+class TieredCache():
+    """Combines an in-process cache with an optional slower cache, such as an
+    SQLiteCache. Values found only in the slower tier are promoted into the
+    in-process tier when read, keeping the expiry time of the slower tier so
+    that promotion does not extend the life of an entry."""
+    MISSING = object()
+
+    def __init__(self, memory, disk=None):
+        self.memory = memory
+        self.disk = disk
+
+    def get(self, key, default=None):
+        value = self.memory.get(key, self.MISSING)
+        if value is not self.MISSING:
+            return value
+
+        if self.disk is not None:
+            entry = self.disk.getEntry(key)
+            if entry is not None:
+                expires, value = entry
+                ttl = expires - time.time() if expires is not None else None
+                self.memory.set(key, value, ttl=ttl)
+                return value
+
+        return default
+
+    def set(self, key, value, ttl=None):
+        self.memory.set(key, value, ttl=ttl)
+        if self.disk is not None:
+            self.disk.set(key, value, ttl=ttl)
+
+    def clear(self):
+        self.memory.clear()
+        if self.disk is not None:
+            self.disk.clear()
+
+    def stats(self):
+        tierStats = {'memory': self.memory.stats()}
+        if self.disk is not None:
+            tierStats['disk'] = self.disk.stats()
+        return tierStats
+
+
+def createCache(prefix, maxSize=256, ttl=None):
+    """Create a cache configured from environment variables that begin with
+    the supplied prefix. {prefix}_SIZE and {prefix}_TTL (in seconds) set the
+    in-process tier. If {prefix}_PATH is set an on-disk SQLite tier is added
+    at that path, limited to {prefix}_DISK_SIZE entries"""
+    maxSize = int(os.environ.get('{}_SIZE'.format(prefix), maxSize))
+    ttl = os.environ.get('{}_TTL'.format(prefix), ttl)
+    ttl = float(ttl) if ttl is not None else None
+
+    memory = LRUCache(maxSize=maxSize, ttl=ttl)
+
+    diskPath = os.environ.get('{}_PATH'.format(prefix), None)
+    if diskPath is None:
+        return TieredCache(memory)
+
+    diskSize = int(os.environ.get('{}_DISK_SIZE'.format(prefix), 10000))
+    try:
+        disk = SQLiteCache(diskPath, maxSize=diskSize, ttl=ttl)
+    except sqlite3.Error as err:
+        logger.warning('Unable to open cache file %s', diskPath)
+        logger.debug(err)
+        disk = None
+
+    return TieredCache(memory, disk)
@@ -1,13 +1,61 @@
-import boto3
 import json
+import threading
 
 from helpers.logHelpers import createLog
 from helpers.errorHelpers import InvalidExecutionType
 from helpers.configHelpers import loadEnvFile
+from helpers.importHelpers import lazyImport
+
+boto3 = lazyImport('boto3')
 
 logger = createLog('clientHelpers')
 
-def createAWSClient(service, configDict=None):
+# AWS clients shared across invocations, created on first use by getAWSClient
+CLIENTS = {}
+CLIENT_LOCK = threading.Lock()
+SESSION = None
+
+
+class AWSClient():
+    """Descriptor for a class attribute holding an AWS client. The client is
+    not created until the attribute is first read, so that importing a module
+    does not load the config file or build a client it may never use"""
+    def __init__(self, service):
+        self.service = service
+
+    def __get__(self, obj, objType=None):
+        return getAWSClient(self.service)
+
+
+def getAWSClient(service):
+    """Return the shared client for an AWS service, creating it if this is
+    the first time it has been requested. All shared clients are created
+    from a single boto3 session"""
+    try:
+        return CLIENTS[service]
+    except KeyError:
+        pass
+
+    global SESSION
+    with CLIENT_LOCK:
+        if service not in CLIENTS:
+            logger.debug('Creating %s client', service)
+            if SESSION is None:
+                SESSION = boto3.session.Session()
+            CLIENTS[service] = createAWSClient(service, session=SESSION)
+
+    return CLIENTS[service]
+
+
+def clearAWSClients():
+    """Discard the shared clients and session, so they are recreated"""
+    global SESSION
+    with CLIENT_LOCK:
+        CLIENTS.clear()
+        SESSION = None
+
+
+def createAWSClient(service, configDict=None, session=None):
 
     if configDict is None:
         configDict, configLines = loadEnvFile(None, None)
@@ -24,7 +72,7 @@ def createAWSClient(service, configDict=None):
         clientKwargs['aws_access_key_id'] = configDict['aws_access_key_id']
         clientKwargs['aws_secret_access_key'] = configDict['aws_secret_access_key']  # noqa: E501
 
-    lambdaClient = boto3.client(
+    lambdaClient = (session or boto3).client(
         service,
         **clientKwargs
     )
@@ -65,6 +113,8 @@ def createEventMapping(runType):
             'Enabled': mapping['Enabled'],
             'BatchSize': mapping['BatchSize']
         }
+        if 'FunctionResponseTypes' in mapping:
+            createKwargs['FunctionResponseTypes'] = mapping['FunctionResponseTypes']  # noqa: E501
         if 'StartingPosition' in mapping:
             createKwargs['StartingPosition'] = mapping['StartingPosition']
             if mapping['StartingPosition'] == 'AT_TIMESTAMP':
@@ -93,4 +143,6 @@ def updateEventMapping(client, mapping, configDict):
         'Enabled': mapping['Enabled'],
         'BatchSize': mapping['BatchSize'],
     }
+    if 'FunctionResponseTypes' in mapping:
+        updateKwargs['FunctionResponseTypes'] = mapping['FunctionResponseTypes']  # noqa: E501
     client.update_event_source_mapping(**updateKwargs)
@@ -1,17 +1,23 @@
-import yaml
+from collections import namedtuple
+import copy
 import shutil
 import os
-import configparser
 
 from helpers.logHelpers import createLog
 from helpers.errorHelpers import InvalidExecutionType
+from helpers.importHelpers import lazyImport
+
+configparser = lazyImport('configparser')
+yaml = lazyImport('yaml')
 
 logger = createLog('configHelpers')
 
-def loadEnvFile(runType, fileString):
+# Parsed config files keyed by path, reloaded if the file is modified
+ConfigFile = namedtuple('ConfigFile', ['path', 'mtime', 'data', 'lines'])
+CONFIG_CACHE = {}
 
-    envDict = None
-    fileLines = []
+
+def loadEnvFile(runType, fileString):
 
     if fileString:
         openFile = fileString.format(runType)
@@ -19,24 +25,55 @@ def loadEnvFile(runType, fileString):
         openFile = 'config.yaml'
         if os.path.isfile('run_config.yaml'):
             openFile = 'run_config.yaml'
-    try:
-        with open(openFile) as envStream:
-            try:
-                envDict = yaml.load(envStream)
-            except yaml.YAMLError as err:
-                logger.error('{} Invalid! Please review'.format(openFile))
-                raise err
-
-            envStream.seek(0)
-            fileLines = envStream.readlines()
 
+    try:
+        configFile = loadConfigFile(openFile)
     except FileNotFoundError as err:
         logger.info('Missing config YAML file! Check directory')
         logger.debug(err)
+        return {}, []
+
+    # Callers may modify the returned config, so the cached copy is not shared
+    return copy.deepcopy(configFile.data), list(configFile.lines)
+
+
+def loadConfigFile(path):
+    """Return the ConfigFile for a YAML file, parsing it only if it has not
+    been read before or has been modified since it was last read"""
+    try:
+        mtime = os.stat(path).st_mtime
+    except OSError:
+        mtime = None
+
+    configFile = CONFIG_CACHE.get(path)
+    if configFile is not None and mtime is not None\
+            and configFile.mtime == mtime:
+        return configFile
+
+    with open(path) as envStream:
+        envText = envStream.read()
+
+    try:
+        envDict = yaml.load(envText, Loader=getYAMLLoader())
+    except yaml.YAMLError as err:
+        logger.error('%s Invalid! Please review', path)
+        raise err
+
+    configFile = ConfigFile(
+        path, mtime,
+        envDict if envDict is not None else {},
+        envText.splitlines(keepends=True)
+    )
+    if mtime is not None:
+        CONFIG_CACHE[path] = configFile
+
+    return configFile
+
 
-    if envDict is None:
-        envDict = {}
-    return envDict, fileLines
+def getYAMLLoader():
+    """The libyaml based loader if PyYAML was built with it, which is
+    considerably faster than the pure Python loader"""
+    return getattr(yaml, 'CSafeLoader', yaml.SafeLoader)
 
 
 def setEnvVars(runType):
@@ -0,0 +1,52 @@
+import importlib
+import importlib.util
+
+
+class LazyModule():
+    """Stands in for a module that is slow to import and is not needed on
+    every invocation. The module is imported the first time one of its
+    attributes is accessed, after which attribute access, assignment and
+    deletion are passed through to it, so that the module can be patched
+    through its lazy reference"""
+    __slots__ = ('_name', '_module')
+
+    def __init__(self, name):
+        object.__setattr__(self, '_name', name)
+        object.__setattr__(self, '_module', None)
+
+    def _load(self):
+        module = self._module
+        if module is None:
+            module = importlib.import_module(self._name)
+            object.__setattr__(self, '_module', module)
+        return module
+
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+
+    def __setattr__(self, attr, value):
+        setattr(self._load(), attr, value)
+
+    def __delattr__(self, attr):
+        delattr(self._load(), attr)
+
+    def __repr__(self):
+        return '<lazy module {}>'.format(self._name)
+
+
+def lazyImport(name):
+    """Return a LazyModule for the named module, which is imported when it is
+    first used"""
+    return LazyModule(name)
+
+
+def optionalImport(name):
+    """Return a LazyModule for an optional dependency, or None if it is not
+    installed. Only locates the module, without importing it"""
+    try:
+        if importlib.util.find_spec(name) is None:
+            return None
+    except ImportError:
+        return None
+
+    return lazyImport(name)
@@ -1,5 +1,8 @@
+import json
 import logging
 import os
+import random
+import threading
 
 levels = {
     'debug': logging.DEBUG,
@@ -9,27 +12,92 @@ levels = {
     'critical': logging.CRITICAL
 }
 
+TEXT_FORMAT = '%(asctime)s | %(name)s | %(levelname)s: %(message)s'
 
-def createLog(module):
+# A single console handler is shared by the loggers of every module, so that
+# calling createLog more than once for a module, such as on each import in
+# tests or on warm Lambda invocations, does not duplicate log lines
+CONSOLE_HANDLER = None
+HANDLER_LOCK = threading.Lock()
 
-    logger = logging.getLogger(module)
 
-    if 'LOG_LEVEL' in os.environ:
-        checkLevel = os.environ['LOG_LEVEL'].lower()
-    else:
-        checkLevel = 'warning'
+class JSONFormatter(logging.Formatter):
+    """Formats each record as a single line of JSON, for log aggregators that
+    parse structured logs. The message is only formatted with its arguments
+    when the record is emitted"""
+    def format(self, record):
+        logRecord = {
+            'time': self.formatTime(record),
+            'logger': record.name,
+            'level': record.levelname,
+            'message': record.getMessage()
+        }
+
+        if record.exc_info:
+            logRecord['exception'] = self.formatException(record.exc_info)
+
+        return json.dumps(logRecord, default=str)
+
+
+class DebugSampleFilter(logging.Filter):
+    """Passes only a sample of DEBUG records, which can include full API
+    responses, to keep debug logging affordable under load. Records of any
+    other level are always passed"""
+    def __init__(self, rate):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record):
+        if record.levelno > logging.DEBUG or self.rate >= 1:
+            return True
+
+        return random.random() < self.rate
+
+
+def getLevel():
+    checkLevel = os.environ.get('LOG_LEVEL', 'warning').lower()
+    return levels.get(checkLevel, levels['warning'])
+
 
-    consoleLog = logging.StreamHandler()
+def getFormatter():
+    if os.environ.get('LOG_FORMAT', 'text').lower() == 'json':
+        return JSONFormatter()
 
-    if checkLevel in levels:
-        logger.setLevel(levels[checkLevel])
-        consoleLog.setLevel(levels[checkLevel])
-    else:
-        logger.setLevel(levels['warning'])
-        consoleLog.setLevel(levels['warning'])
+    return logging.Formatter(TEXT_FORMAT)
+
+
+def getSampleRate():
+    try:
+        return float(os.environ.get('LOG_DEBUG_SAMPLE_RATE', 1))
+    except ValueError:
+        return 1.0
+
+
+def getConsoleHandler():
+    """Return the console handler shared by all loggers, configured from the
+    current environment"""
+    global CONSOLE_HANDLER
+    with HANDLER_LOCK:
+        if CONSOLE_HANDLER is None:
+            CONSOLE_HANDLER = logging.StreamHandler()
+            CONSOLE_HANDLER.addFilter(DebugSampleFilter(1.0))
+
+        CONSOLE_HANDLER.setLevel(getLevel())
+        CONSOLE_HANDLER.setFormatter(getFormatter())
+        for logFilter in CONSOLE_HANDLER.filters:
+            if isinstance(logFilter, DebugSampleFilter):
+                logFilter.rate = getSampleRate()
+
+        return CONSOLE_HANDLER
+
+
+def createLog(module):
+
+    logger = logging.getLogger(module)
+    logger.setLevel(getLevel())
 
-    formatter = logging.Formatter('%(asctime)s | %(name)s | %(levelname)s: %(message)s')  # noqa: E501
-    consoleLog.setFormatter(formatter)
+    consoleLog = getConsoleHandler()
+    if consoleLog not in logger.handlers:
+        logger.addHandler(consoleLog)
 
-    logger.addHandler(consoleLog)
     return logger
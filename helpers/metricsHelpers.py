@@ -0,0 +1,188 @@
+from contextlib import contextmanager
+from functools import wraps
+import json
+import logging
+import os
+import threading
+import time
+
+from helpers.logHelpers import createLog
+
+logger = createLog('metrics')
+
+# Metrics of the request being handled in the current thread. Threads in
+# pools do not inherit this, see propagateMetrics
+CURRENT_METRICS = threading.local()
+
+
+def setMetrics(metrics):
+    """Set the metrics of the current thread, returning the metrics that
+    were set before so that they can be restored with resetMetrics"""
+    previous = getCurrentMetrics()
+    CURRENT_METRICS.metrics = metrics
+    return previous
+
+
+def resetMetrics(previous):
+    CURRENT_METRICS.metrics = previous
+
+
+def getCurrentMetrics():
+    return getattr(CURRENT_METRICS, 'metrics', None)
+
+
+class RequestMetrics():
+    """Records the number of times each stage of the lookup pipeline runs
+    during a request and the total time spent in each. Stages may be
+    recorded from multiple threads at once"""
+    def __init__(self, name):
+        self.name = name
+        self.stages = {}
+        self.startTime = time.perf_counter()
+        self.duration = None
+        self.lock = threading.Lock()
+
+    def record(self, stage, duration):
+        with self.lock:
+            count, total = self.stages.get(stage, (0, 0.0))
+            self.stages[stage] = (count + 1, total + duration)
+
+    def finish(self):
+        self.duration = time.perf_counter() - self.startTime
+
+    def getStages(self):
+        """Return a dict of the count and total duration in milliseconds of
+        each stage"""
+        with self.lock:
+            return {
+                stage: {'count': count, 'duration': round(total * 1000, 3)}
+                for stage, (count, total) in self.stages.items()
+            }
+
+    def toLogRecord(self):
+        return {
+            'request': self.name,
+            'duration': round((self.duration or 0) * 1000, 3),
+            'stages': self.getStages()
+        }
+
+    def toEMF(self, namespace):
+        """Format the metrics in the CloudWatch embedded metric format, with
+        a duration and count metric for each stage"""
+        stages = self.getStages()
+        record = {
+            '_aws': {
+                'Timestamp': int(time.time() * 1000),
+                'CloudWatchMetrics': [{
+                    'Namespace': namespace,
+                    'Dimensions': [['request']],
+                    'Metrics': [{'Name': 'duration', 'Unit': 'Milliseconds'}]
+                }]
+            },
+            'request': self.name,
+            'duration': round((self.duration or 0) * 1000, 3)
+        }
+
+        metricDefs = record['_aws']['CloudWatchMetrics'][0]['Metrics']
+        for stage, values in stages.items():
+            metricDefs.append({
+                'Name': '{}.duration'.format(stage), 'Unit': 'Milliseconds'
+            })
+            metricDefs.append({
+                'Name': '{}.count'.format(stage), 'Unit': 'Count'
+            })
+            record['{}.duration'.format(stage)] = values['duration']
+            record['{}.count'.format(stage)] = values['count']
+
+        return record
+
+    def toServerTiming(self):
+        """Format the stage durations as a Server-Timing header value"""
+        return ', '.join(
+            '{};dur={}'.format(stage, values['duration'])
+            for stage, values in self.getStages().items()
+        )
+
+
+@contextmanager
+def trackRequest(name):
+    """Record the stages of a request run within this context, emitting the
+    results once the request is complete"""
+    metrics = RequestMetrics(name)
+    previous = setMetrics(metrics)
+    try:
+        yield metrics
+    finally:
+        resetMetrics(previous)
+        metrics.finish()
+        emitMetrics(metrics)
+
+
+@contextmanager
+def timeStage(stage):
+    """Record the duration of a stage of the current request. Does nothing
+    outside of a tracked request"""
+    metrics = getCurrentMetrics()
+    if metrics is None:
+        yield
+        return
+
+    startTime = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics.record(stage, time.perf_counter() - startTime)
+
+
+def timed(stage):
+    """Decorator recording each call of a function as a stage"""
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with timeStage(stage):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def propagateMetrics(func):
+    """Wrap a function to be run in another thread, such as in a pool, so
+    that it records stages to the metrics of the current request"""
+    metrics = getCurrentMetrics()
+    if metrics is None:
+        return func
+
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        previous = setMetrics(metrics)
+        try:
+            return func(*args, **kwargs)
+        finally:
+            resetMetrics(previous)
+    return wrapper
+
+
+def getServerTiming():
+    """The Server-Timing header value for the current request, or None if
+    METRICS_HEADER is not enabled or no request is being tracked"""
+    if os.environ.get('METRICS_HEADER', 'false') != 'true':
+        return None
+
+    metrics = getCurrentMetrics()
+    if metrics is None:
+        return None
+
+    return metrics.toServerTiming()
+
+
+def emitMetrics(metrics):
+    """Write the metrics of a completed request as a structured log line, or
+    to stdout in the CloudWatch embedded metric format if METRICS_FORMAT is
+    set to emf"""
+    metricsFormat = os.environ.get('METRICS_FORMAT', 'log')
+    if metricsFormat == 'emf':
+        print(json.dumps(metrics.toEMF(
+            os.environ.get('METRICS_NAMESPACE', 'sfr-oclc-catalog-lookup')
+        )), flush=True)
+    elif metricsFormat != 'none' and logger.isEnabledFor(logging.INFO):
+        logger.info(json.dumps(metrics.toLogRecord()))
@@ -0,0 +1,48 @@
+from concurrent.futures import ThreadPoolExecutor
+import os
+import threading
+
+from helpers.metricsHelpers import propagateMetrics
+
+IO_POOL = None
+IO_POOL_LOCK = threading.Lock()
+
+
+def getIOPool():
+    """Returns a thread pool shared by all network bound tasks in the
+    function, such as VIAF and HathiTrust requests. The pool is created on
+    first use and reused across records and warm invocations. Tasks given to
+    this pool should not themselves wait on other tasks in the pool"""
+    global IO_POOL
+    with IO_POOL_LOCK:
+        if IO_POOL is None:
+            IO_POOL = ThreadPoolExecutor(
+                max_workers=max(int(os.environ.get('IO_POOL_SIZE', 8)), 1),
+                thread_name_prefix='io-pool'
+            )
+
+    return IO_POOL
+
+
+def resetIOPool():
+    """Discard the shared pool and its lock without shutting the pool down.
+    Must be called in processes forked from one that may have used the pool,
+    as they inherit the pool without any of its threads and so tasks given to
+    it would never run"""
+    global IO_POOL, IO_POOL_LOCK
+    IO_POOL = None
+    IO_POOL_LOCK = threading.Lock()
+
+
+def mapIO(func, items, threshold=None):
+    """Apply a function to each item using the shared I/O pool, returning the
+    results in the order of the items. Lists shorter than the threshold are
+    processed in the current thread as the pool would not save any time"""
+    if threshold is None:
+        threshold = int(os.environ.get('IO_POOL_THRESHOLD', 2))
+
+    items = list(items)
+    if len(items) < threshold:
+        return [func(item) for item in items]
+
+    return list(getIOPool().map(propagateMetrics(func), items))
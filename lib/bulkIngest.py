@@ -0,0 +1,69 @@
+import os
+
+from helpers.importHelpers import lazyImport
+from helpers.logHelpers import createLog
+from lib.parsePool import ParsePool
+
+etree = lazyImport('lxml.etree')
+
+logger = createLog('bulk_ingest')
+
+
+def ingestMARC(path, outStream, processes=None, ordered=True, chunkSize=50,
+               offline=True):
+    """Parse every record in a MARCXML collection file, or a directory of
+    such files, writing each resulting InstanceRecord to the output stream as
+    a line of JSON. Records are read incrementally and parsed across a pool
+    of processes, one per CPU core by default. If ordered is False records
+    are written as soon as they are parsed rather than in input order. By
+    default records are parsed offline, without enriching them from VIAF,
+    HathiTrust or the Internet Archive, so that ingest is not limited by
+    the network. Returns the number of records written"""
+    written = 0
+    failed = 0
+    with ParsePool(
+        processes, ordered=ordered, chunkSize=chunkSize, offline=offline
+    ) as pool:
+        rawRecords = (
+            rawRecord
+            for filePath in findMARCFiles(path)
+            for rawRecord in iterRawRecords(filePath)
+        )
+        for _, jsonRecord in pool.parse(rawRecords):
+            if jsonRecord is None:
+                failed += 1
+                continue
+            outStream.write(jsonRecord)
+            outStream.write('\n')
+            written += 1
+
+    logger.info('Wrote %s records from %s', written, path)
+    if failed > 0:
+        logger.warning('Unable to parse %s records from %s', failed, path)
+    return written
+
+
+def findMARCFiles(path):
+    """Return the MARCXML files to be ingested. If the path is a directory
+    all .xml files within it are returned in name order"""
+    if not os.path.isdir(path):
+        return [path]
+
+    return [
+        os.path.join(path, fileName)
+        for fileName in sorted(os.listdir(path))
+        if fileName.endswith('.xml')
+    ]
+
+
+def iterRawRecords(source):
+    """Incrementally read a MARCXML collection, yielding the serialized bytes
+    of each record. Each record element is freed once it has been yielded so
+    that the whole collection is never held in memory"""
+    logger.debug('Reading records from %s', source)
+    for _, elem in etree.iterparse(source, events=('end',), tag='{*}record'):
+        yield etree.tostring(elem)
+
+        elem.clear()
+        while elem.getprevious() is not None:
+            del elem.getparent()[0]
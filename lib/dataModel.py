@@ -1,7 +1,25 @@
-from Levenshtein import distance, jaro_winkler
 from collections import defaultdict
+from operator import attrgetter
+import os
+import re
 
-class DataObject(object):
+from helpers.importHelpers import lazyImport, optionalImport
+
+Levenshtein = lazyImport('Levenshtein')
+fuzzProcess = lazyImport('rapidfuzz.process')
+JaroWinkler = lazyImport('rapidfuzz.distance.JaroWinkler')
+numpy = optionalImport('numpy')
+
+# Drop identifiers with the same type and value as one already on a record
+DEDUPE_IDENTIFIERS = os.environ.get('DEDUPE_IDENTIFIERS', 'false') == 'true'
+
+# Number of name comparisons above which agents are only compared with
+# those sharing a blocking key when merging
+AGENT_BLOCKING_PAIRS = int(os.environ.get('AGENT_BLOCKING_PAIRS', 10000))
+
+NAME_TOKEN_REGEX = re.compile(r'\w+')
+
+class DictDataObject(object):
     """Abstract data model object that specific classes inherit from. Sets
     basic functions that allow writing/retrieving attributes."""
     def __init__(self):
@@ -30,9 +48,205 @@ class DataObject(object):
         return record
 
 
+class SlottedDataObject(object):
+    """Variant of DictDataObject for runs that hold many records in memory,
+    such as bulk ingests, selected by setting DATA_MODEL to slotted.
+
+    Fields are stored in __slots__, declared by each class in the order they
+    are set in __init__, rather than in a per-instance __dict__. Keys that
+    are not fields of the class are stored in the extras mapping, which is
+    only created when needed, and can be read as attributes. This uses less
+    memory per object, but records are slower to serialize as their dicts
+    must be built rather than read from __dict__."""
+    __slots__ = ('_extras',)
+    FIELDS = ()
+    FIELD_SET = frozenset()
+    getFieldValues = staticmethod(lambda obj: ())
+
+    def __init__(self):
+        self._extras = None
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls.FIELDS = tuple(
+            field
+            for parent in reversed(cls.__mro__)
+            for field in parent.__dict__.get('__slots__', ())
+            if field != '_extras'
+        )
+        cls.FIELD_SET = frozenset(cls.FIELDS)
+        cls.getFieldValues = staticmethod(
+            attrgetter(*cls.FIELDS) if len(cls.FIELDS) > 1
+            else lambda obj: tuple(getattr(obj, f) for f in cls.FIELDS)
+        )
+
+    def __setitem__(self, key, value):
+        if key in self.FIELD_SET:
+            setattr(self, key, value)
+        else:
+            self.extras[key] = value
+
+    def __getitem__(self, key):
+        if key in self.FIELD_SET:
+            return getattr(self, key)
+        return self.extras[key]
+
+    def __getattr__(self, key):
+        # Only called when the key is not a set field
+        if key != '_extras':
+            try:
+                return self._extras[key]
+            except (AttributeError, KeyError, TypeError):
+                pass
+        raise AttributeError('{} has no field {}'.format(
+            type(self).__name__, key
+        ))
+
+    @property
+    def extras(self):
+        """Mapping of keys set on this object that are not fields of its
+        class"""
+        if self._extras is None:
+            self._extras = {}
+        return self._extras
+
+    def getDictValue(self):
+        """Convert current object into a dict. Used for generating JSON objects
+        and in other instances where a standard type is necessary."""
+        record = dict(zip(self.FIELDS, self.getFieldValues(self)))
+        if self._extras:
+            record.update(self._extras)
+        return record
+
+    @classmethod
+    def createFromDict(cls, **kwargs):
+        """Take a standard dict object and convert to an instance of the
+        provided class. Allows for creation of new instances with arbitrary
+        fields set"""
+        record = cls()
+        for field, value in kwargs.items():
+            record[field] = value
+
+        return record
+
+
+# The data model classes below store their fields in __dict__ by default, or
+# in __slots__ if DATA_MODEL is set to slotted. This is read once on import
+SLOTTED_MODEL = os.environ.get('DATA_MODEL', 'dict') == 'slotted'
+
+DataObject = SlottedDataObject if SLOTTED_MODEL else DictDataObject
+
+
+def modelSlots(*fields):
+    """The __slots__ of a data model class with the given fields, which are
+    only slotted in the slotted data model"""
+    return fields if SLOTTED_MODEL else ()
+
+
+class IndexedList(list):
+    """List of data model objects that also indexes each object by a key,
+    allowing the first object with a key to be found without scanning the
+    list. If dedupe is set objects with a key already in the list are not
+    added. Objects are indexed when added, so later changes to the keyed
+    fields of an object are not reflected in the index"""
+    __slots__ = ('keyFunc', 'dedupe', 'index')
+
+    def __init__(self, keyFunc, items=None, dedupe=False):
+        super().__init__()
+        self.keyFunc = keyFunc
+        self.dedupe = dedupe
+        self.index = {}
+        if items is not None:
+            self.extend(items)
+
+    def __reduce__(self):
+        return (IndexedList, (self.keyFunc, list(self), self.dedupe))
+
+    def get(self, key, default=None):
+        """Return the first object in the list with the key"""
+        return self.index.get(key, default)
+
+    def indexItem(self, item):
+        """Add an object to the index, returning False if it should not be
+        added to the list as its key is already present"""
+        key = self.keyFunc(item)
+        if key in self.index:
+            return not self.dedupe
+
+        self.index[key] = item
+        return True
+
+    def reindex(self):
+        self.index = {}
+        for item in self:
+            self.index.setdefault(self.keyFunc(item), item)
+
+    def append(self, item):
+        if self.indexItem(item):
+            super().append(item)
+
+    def extend(self, items):
+        for item in items:
+            self.append(item)
+
+    def __iadd__(self, items):
+        self.extend(items)
+        return self
+
+    def insert(self, position, item):
+        if self.dedupe and self.keyFunc(item) in self.index:
+            return
+        super().insert(position, item)
+        self.reindex()
+
+    def __setitem__(self, position, item):
+        super().__setitem__(position, item)
+        self.reindex()
+
+    def __delitem__(self, position):
+        super().__delitem__(position)
+        self.reindex()
+
+    def remove(self, item):
+        super().remove(item)
+        self.reindex()
+
+    def pop(self, *args):
+        item = super().pop(*args)
+        self.reindex()
+        return item
+
+    def clear(self):
+        super().clear()
+        self.index = {}
+
+    def sort(self, *args, **kwargs):
+        super().sort(*args, **kwargs)
+        self.reindex()
+
+    def reverse(self):
+        super().reverse()
+        self.reindex()
+
+
+def identifierKey(identifier):
+    return (identifier['type'], identifier['identifier'])
+
+
+def dateKey(date):
+    return date['date_type']
+
+
 class WorkRecord(DataObject):
+    __slots__ = modelSlots(
+        'identifiers', 'instances', 'subjects', 'agents', 'links',
+        'measurements', 'dates', 'uuid', 'license', 'language', 'title',
+        'sub_title', 'alt_titles', 'sort_title', 'rights_statement', 'medium',
+        'series', 'seriesPosition', 'primary_identifier'
+    )
+
     def __init__(self):
-        super()
+        super().__init__()
         self.identifiers = []
         self.instances = []
         self.subjects = []
@@ -73,8 +287,15 @@ class WorkRecord(DataObject):
 
 
 class InstanceRecord(DataObject):
+    __slots__ = modelSlots(
+        'title', 'language', 'sub_title', 'alt_titles', 'pub_place', 'edition',
+        'extent', 'edition_statement', 'table_of_contents', 'copyright_date',
+        'series', 'series_position', 'agents', 'identifiers', 'formats',
+        'measurements', 'subjects', 'links', 'dates'
+    )
+
     def __init__(self, title=None, language=None):
-        super()
+        super().__init__()
         self.title = title
         self.language = language
         self.sub_title = None
@@ -88,12 +309,37 @@ class InstanceRecord(DataObject):
         self.series = None
         self.series_position = None
         self.agents = []
-        self.identifiers = []
+        self.identifiers = IndexedList(
+            identifierKey, dedupe=DEDUPE_IDENTIFIERS
+        )
         self.formats = []
         self.measurements = []
         self.subjects = []
         self.links = []
-        self.dates = []
+        self.dates = IndexedList(dateKey)
+
+    def __setattr__(self, key, value):
+        super().__setattr__(key, InstanceRecord.indexValue(key, value))
+
+    def __setitem__(self, key, value):
+        super().__setitem__(key, InstanceRecord.indexValue(key, value))
+
+    @staticmethod
+    def indexValue(key, value):
+        """Convert lists assigned to identifiers or dates, such as through
+        createFromDict, to IndexedLists so that they can still be looked up
+        and identifiers are still deduplicated"""
+        if type(value) is not list:
+            return value
+
+        if key == 'identifiers':
+            return IndexedList(
+                identifierKey, value, dedupe=DEDUPE_IDENTIFIERS
+            )
+        elif key == 'dates':
+            return IndexedList(dateKey, value)
+
+        return value
 
     def addIdentifier(self, **identifierDict):
         self.identifiers.append(Identifier.createFromDict(**identifierDict))
@@ -110,10 +356,22 @@ class InstanceRecord(DataObject):
     def addDate(self, **dateDict):
         self.dates.append(Date.createFromDict(**dateDict))
 
+    def getIdentifier(self, idType, identifier):
+        """Return the identifier of the type and value, or None"""
+        return self.identifiers.get((idType, identifier))
+
+    def getDate(self, dateType):
+        """Return the first date of the type, or None"""
+        return self.dates.get(dateType)
+
 
 class Format(DataObject):
+    __slots__ = modelSlots(
+        'content_type', 'modified', 'drm', 'measurements', 'links', 'dates'
+    )
+
     def __init__(self, content_type=None, link=None, modified=None):
-        super()
+        super().__init__()
         self.content_type = content_type
         self.modified = modified
         self.drm = None
@@ -132,8 +390,13 @@ class Format(DataObject):
 
 
 class Agent(DataObject):
+    __slots__ = modelSlots(
+        'name', 'sort_name', 'lcnaf', 'viaf', 'biography', 'aliases', 'link',
+        'dates', 'roles'
+    )
+
     def __init__(self, name=None, role=None, aliases=None, birth=None, death=None, link=None):
-        super()
+        super().__init__()
         self.name = name
         self.sort_name = None
         self.lcnaf = None
@@ -151,15 +414,18 @@ class Agent(DataObject):
         else:
             self.roles = role
 
-    # TODO This method is pretty ugly and there must be a better way to merge
-    # agent records. However, it does work
     @staticmethod
     def checkForMatches(newAgents, agents):
+        """Merge each agent into the first of the new agents with a similar
+        name, returning the merged agents and any unmatched agents"""
         merged = defaultdict(dict)
+        matcher = AgentMatcher(
+            newAgents,
+            blocking=len(newAgents) * len(agents) > AGENT_BLOCKING_PAIRS
+        )
         for agent in agents:
-            merger = list(filter(lambda x: jaro_winkler(x['name'].lower(), agent['name'].lower()) > 0.8, newAgents))
-            if(len(merger) > 0):
-                mergedAgent = merger[0]
+            mergedAgent = matcher.findMatch(agent['name'])
+            if mergedAgent is not None:
                 merged[mergedAgent['name']] = Agent.mergeFromDict(agent, mergedAgent)
             else:
                 merged[agent.name] = agent
@@ -170,6 +436,53 @@ class Agent(DataObject):
 
         return merged.values()
 
+    @staticmethod
+    def scoreNames(names, agents, workers=1):
+        """Score each name against the name of each agent in a single call,
+        returning a matrix with a row of Jaro-Winkler similarities for each
+        name. Names are compared case insensitively, as in checkForMatches.
+        If numpy is installed the matrix is computed by rapidfuzz.cdist,
+        which can use multiple workers, otherwise each row is computed in a
+        single rapidfuzz call"""
+        names = [name.lower() for name in names]
+        agentNames = [agent['name'].lower() for agent in agents]
+
+        if numpy is not None:
+            return fuzzProcess.cdist(
+                names, agentNames,
+                scorer=JaroWinkler.similarity, workers=workers
+            ).tolist()
+
+        scores = []
+        for name in names:
+            row = [0.0] * len(agentNames)
+            for _, score, position in fuzzProcess.extract(
+                name, agentNames, scorer=JaroWinkler.similarity, limit=None
+            ):
+                row[position] = score
+            scores.append(row)
+
+        return scores
+
+    @staticmethod
+    def topMatches(names, agents, limit=1, threshold=0.8):
+        """Return, for each name, a list of up to limit (agent, score) tuples
+        for the agents with the most similar names, best first. Only agents
+        with a similarity above the threshold are returned"""
+        agentNames = [agent['name'].lower() for agent in agents]
+
+        return [
+            [
+                (agents[position], score)
+                for _, score, position in fuzzProcess.extract(
+                    name.lower(), agentNames, scorer=JaroWinkler.similarity,
+                    limit=limit, score_cutoff=threshold
+                )
+                if score > threshold
+            ]
+            for name in names
+        ]
+
     @staticmethod
     def mergeFromDict(otherAgent, agent):
         if isinstance(otherAgent, Agent):
@@ -187,17 +500,73 @@ class Agent(DataObject):
         return agent
 
 
+class AgentMatcher():
+    """Finds the first of a list of agents with a name similar to a given
+    name, with a Jaro-Winkler similarity of more than 0.8. Names are
+    lowercased once when the matcher is created. If blocking is set names
+    are only compared with those sharing a blocking key, rather than with
+    every agent, which scales to long contributor lists at the cost of
+    missing a small number of matches between dissimilar looking names"""
+    THRESHOLD = 0.8
+
+    def __init__(self, agents, blocking=False):
+        self.agents = agents
+        self.names = [agent['name'].lower() for agent in agents]
+        self.blocks = None
+
+        if blocking:
+            self.blocks = defaultdict(list)
+            for position, name in enumerate(self.names):
+                for key in AgentMatcher.blockingKeys(name):
+                    self.blocks[key].append(position)
+
+    @staticmethod
+    def blockingKeys(name):
+        """Keys shared by names likely to be similar. These are the start of
+        the name, as Jaro-Winkler favors names with a common prefix, and the
+        start of each token, so that names with reordered or abbreviated
+        parts are still compared"""
+        keys = set(
+            token[:3] for token in NAME_TOKEN_REGEX.findall(name)
+        )
+        keys.add(name[:2])
+        return keys
+
+    def findMatch(self, name):
+        name = name.lower()
+        if self.blocks is None:
+            positions = range(len(self.names))
+        else:
+            positions = sorted(set(
+                position
+                for key in AgentMatcher.blockingKeys(name)
+                for position in self.blocks.get(key, [])
+            ))
+
+        for position in positions:
+            if Levenshtein.jaro_winkler(self.names[position], name) > self.THRESHOLD:
+                return self.agents[position]
+
+        return None
+
+
 class Identifier(DataObject):
+    __slots__ = modelSlots('type', 'identifier', 'weight')
+
     def __init__(self, source=None, identifier=None, weight=None):
-        super()
+        super().__init__()
         self.type = source
         self.identifier = identifier
         self.weight = weight
 
 
 class Link(DataObject):
+    __slots__ = modelSlots(
+        'url', 'media_type', 'content', 'flags', 'thumbnail'
+    )
+
     def __init__(self, url=None, mediaType=None, flags=None):
-        super()
+        super().__init__()
         self.url = url
         self.media_type = mediaType
         self.content = None
@@ -206,8 +575,12 @@ class Link(DataObject):
 
 
 class Subject(DataObject):
+    __slots__ = modelSlots(
+        'authority', 'subject', 'uri', 'weight', 'measurements'
+    )
+
     def __init__(self, subjectType=None, value=None, weight=None):
-        super()
+        super().__init__()
         self.authority = subjectType
         self.subject = value
         self.uri = None
@@ -219,8 +592,12 @@ class Subject(DataObject):
 
 
 class Measurement(DataObject):
+    __slots__ = modelSlots(
+        'quantity', 'value', 'weight', 'taken_at', 'source_id'
+    )
+
     def __init__(self, quantity=None, value=None, weight=None, takenAt=None, sourceID=None):
-        super()
+        super().__init__()
         self.quantity = quantity
         self.value = value
         self.weight = weight
@@ -234,8 +611,10 @@ class Measurement(DataObject):
 
 
 class Date(DataObject):
+    __slots__ = modelSlots('display_date', 'date_range', 'date_type')
+
     def __init__(self, displayDate=None, dateRange=None, dateType=None):
-        super()
+        super().__init__()
         self.display_date = displayDate
         self.date_range = dateRange
         self.date_type = dateType
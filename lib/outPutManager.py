@@ -1,18 +1,22 @@
-import boto3
-import json
 import datetime
+import os
 import time
 
 from helpers.errorHelpers import KinesisError
+from helpers.importHelpers import lazyImport
 from helpers.logHelpers import createLog
-from helpers.clientHelpers import createAWSClient
+from helpers.metricsHelpers import timed, getServerTiming
+from helpers.clientHelpers import AWSClient
+from lib.serializer import toJSON
+
+botocoreExceptions = lazyImport('botocore.exceptions')
 
 logger = createLog('kinesis_write')
 
 
 class OutputManager():
     """Class for managing connections and operations with AWS Kinesis"""
-    KINESIS_CLIENT = createAWSClient('kinesis')
+    KINESIS_CLIENT = AWSClient('kinesis')
 
     def __init__(self):
         pass
@@ -35,12 +39,19 @@ class OutputManager():
             logger.error('Kinesis Write error!')
             raise KinesisError('Failed to write result to output stream!')
 
+    @classmethod
+    def createBuffer(cls, stream):
+        """Create a KinesisBuffer that writes to the specified stream with
+        the shared Kinesis client"""
+        return KinesisBuffer(stream, client=cls.KINESIS_CLIENT)
+
     @staticmethod
+    @timed('json_encode')
     def _convertToJSON(obj):
-        """Converts an object or dict to a JSON string.
-        the DEFAULT parameter implements a lambda function to get the values
-        from an object using the vars() builtin."""
-        return json.dumps(obj, ensure_ascii=False, default=lambda x: vars(x))
+        """Converts an object or dict to a JSON string. Data model objects
+        are converted to dicts with the serializers in lib.serializer, and
+        any other objects using the vars() builtin."""
+        return toJSON(obj)
 
     @staticmethod
     def formatResponse(status, data):
@@ -53,11 +64,134 @@ class OutputManager():
             [dict] -- A complete response object containing a status and
             relevant data.
         """
+        body = OutputManager._convertToJSON(data)
+
+        headers = {
+            'req-time': time.time()
+        }
+        serverTiming = getServerTiming()
+        if serverTiming is not None:
+            headers['Server-Timing'] = serverTiming
+
         return {
             'statusCode': status,
-            'headers': {
-                'req-time': time.time()
-            },
+            'headers': headers,
             'isBase64Encoded': False,
-            'body': OutputManager._convertToJSON(data)
+            'body': body
         }
+
+
+class KinesisBuffer():
+    """Accumulates serialized records and writes them to a Kinesis stream in
+    batches with put_records, rather than making a request per record.
+    Batches are flushed before they exceed the limits of the put_records API
+    and entries that fail with a retryable error code are retried with
+    exponential backoff. Each record can be given a tag, the tags of records
+    that could not be written are returned by flush and kept in failed"""
+    MAX_RECORDS = 500
+    MAX_BATCH_BYTES = 5 * 1024 * 1024
+    MAX_RECORD_BYTES = 1024 * 1024
+    RETRYABLE_ERRORS = frozenset([
+        'ProvisionedThroughputExceededException', 'InternalFailure'
+    ])
+
+    def __init__(self, stream, client=None, retries=None, backoff=None):
+        self.stream = stream
+        self.client = client
+        self.retries = retries if retries is not None\
+            else int(os.environ.get('KINESIS_RETRIES', 3))
+        self.backoff = backoff if backoff is not None\
+            else float(os.environ.get('KINESIS_BACKOFF', 0.1))
+        self.entries = []
+        self.tags = []
+        self.size = 0
+        self.failed = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, excType, excValue, traceback):
+        self.flush()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def add(self, outputObject, partitionKey, tag=None):
+        """Serialize and buffer a record, flushing the buffer first if the
+        record would not fit in the current batch. Raises a KinesisError if
+        the record is larger than Kinesis accepts"""
+        data = OutputManager._convertToJSON(outputObject).encode('utf-8')
+        recordSize = len(data) + len(partitionKey.encode('utf-8'))
+        if recordSize > self.MAX_RECORD_BYTES:
+            logger.error('Record %s is too large for Kinesis', partitionKey)
+            raise KinesisError('Record exceeds Kinesis record size limit')
+
+        if len(self.entries) >= self.MAX_RECORDS\
+                or self.size + recordSize > self.MAX_BATCH_BYTES:
+            self.flush()
+
+        self.entries.append({'Data': data, 'PartitionKey': partitionKey})
+        self.tags.append(tag)
+        self.size += recordSize
+
+    def flush(self):
+        """Write all buffered records to the stream, returning the tags of
+        any records that could not be written"""
+        if len(self.entries) < 1:
+            return []
+
+        entries, tags = self.entries, self.tags
+        self.entries, self.tags, self.size = [], [], 0
+
+        logger.info('Writing %s results to Kinesis', len(entries))
+        failedTags = self._putEntries(entries, tags)
+        if len(failedTags) > 0:
+            logger.error(
+                'Failed to write %s records to Kinesis', len(failedTags)
+            )
+        self.failed.extend(failedTags)
+        return failedTags
+
+    def _putEntries(self, entries, tags):
+        client = self.client or OutputManager.KINESIS_CLIENT
+        failedTags = []
+        for attempt in range(self.retries + 1):
+            if attempt > 0:
+                time.sleep(self.backoff * 2 ** (attempt - 1))
+
+            try:
+                resp = client.put_records(
+                    StreamName=self.stream,
+                    Records=entries
+                )
+            except (
+                botocoreExceptions.BotoCoreError,
+                botocoreExceptions.ClientError
+            ) as err:
+                logger.warning('Kinesis put_records request failed')
+                logger.debug(err)
+                continue
+
+            if resp.get('FailedRecordCount', 0) < 1:
+                return failedTags
+
+            retryEntries, retryTags = [], []
+            for entry, tag, result in zip(entries, tags, resp['Records']):
+                errorCode = result.get('ErrorCode')
+                if errorCode is None:
+                    continue
+                elif errorCode in self.RETRYABLE_ERRORS:
+                    retryEntries.append(entry)
+                    retryTags.append(tag)
+                else:
+                    logger.debug(
+                        'Kinesis rejected record: %s',
+                        result.get('ErrorMessage')
+                    )
+                    failedTags.append(tag)
+
+            entries, tags = retryEntries, retryTags
+            if len(entries) < 1:
+                return failedTags
+
+        return failedTags + tags
@@ -0,0 +1,116 @@
+from functools import partial
+import os
+
+from helpers.errorHelpers import OCLCError
+from helpers.importHelpers import lazyImport
+from helpers.logHelpers import createLog
+from helpers.poolHelpers import resetIOPool
+from lib.outPutManager import OutputManager
+from lib.parsers.parseOCLC import readFromMARC, MARC_TAGS
+from lib.readers.compactMARC import parseCompactMARC
+
+multiprocessing = lazyImport('multiprocessing')
+
+logger = createLog('parse_pool')
+
+# Minimal record parsed by each worker when it starts
+WARM_RECORD = (
+    b'<record><controlfield tag="001">0</controlfield>'
+    b'<datafield tag="245" ind1="0" ind2="0"><subfield code="a">'
+    b'</subfield></datafield></record>'
+)
+
+
+class ParsePool():
+    """Pool of worker processes that parse raw MARCXML records into
+    InstanceRecords, spreading the CPU bound parsing across cores. Workers
+    receive the raw bytes (or text) of each record and return the parsed
+    record serialized as JSON, avoiding pickling of parsed objects between
+    processes. If offline is set records are parsed without the network
+    requests that enrich them, see readFromMARC.
+
+    Note that this relies on multiprocessing.Pool, which requires /dev/shm
+    and so is not available within AWS Lambda."""
+    def __init__(self, processes=None, ordered=True, chunkSize=20,
+                 offline=False):
+        self.processes = processes
+        self.ordered = ordered
+        self.chunkSize = chunkSize
+        self.offline = offline
+        self.pool = None
+
+    def __enter__(self):
+        self.pool = multiprocessing.Pool(
+            processes=self.processes, initializer=warmWorker
+        )
+        return self
+
+    def __exit__(self, excType, excValue, traceback):
+        self.pool.terminate()
+        self.pool.join()
+        self.pool = None
+
+    def parse(self, rawRecords):
+        """Parse an iterable of raw MARCXML records, yielding a tuple of the
+        position of each record in the iterable and its JSON serialization,
+        or None if it could not be parsed. If the pool is ordered results are
+        yielded in the order received, otherwise as soon as they are ready"""
+        if self.ordered:
+            mapMethod = self.pool.imap
+        else:
+            mapMethod = self.pool.imap_unordered
+
+        return mapMethod(
+            partial(parseIndexedRecord, offline=self.offline),
+            enumerate(rawRecords), self.chunkSize
+        )
+
+
+def getParseProcesses():
+    """Number of processes used to parse records in batch mode. The default of
+    0 parses records in the fetching thread. As ParsePool can't run within
+    AWS Lambda, this is always 0 when running there"""
+    processes = int(os.environ.get('PARSE_PROCESSES', 0))
+    if processes > 0 and 'AWS_LAMBDA_FUNCTION_NAME' in os.environ:
+        logger.warning('PARSE_PROCESSES is not supported in AWS Lambda')
+        return 0
+
+    return processes
+
+
+def warmWorker():
+    """Run once when each worker process starts, so that the cost of setting
+    up the parser is not paid on the first record given to each worker. The
+    I/O pool inherited from the parent process has no threads in the worker,
+    so it is reset for records parsed with network requests"""
+    resetIOPool()
+    parseCompactMARC(WARM_RECORD, MARC_TAGS)
+
+
+def parseIndexedRecord(indexedRecord, offline=False):
+    position, rawRecord = indexedRecord
+    return position, parseRawRecord(rawRecord, offline=offline)
+
+
+def parseRawRecord(rawRecord, offline=False):
+    """Parse a single raw MARCXML record into an InstanceRecord and return it
+    serialized as JSON. Returns None if the record can't be parsed, or any
+    other error is raised while parsing it, so that a single bad record does
+    not halt the rest of the records in the pool"""
+    try:
+        instance = readFromMARC(
+            parseCompactMARC(rawRecord, MARC_TAGS), offline=offline
+        )
+    except OCLCError as err:
+        logger.error('Unable to parse MARC record: %s', err.message)
+        return None
+    except (IndexError, KeyError, AttributeError) as err:
+        logger.error('Skipping MARC record missing required fields')
+        logger.debug(err)
+        return None
+    except Exception as err:
+        logger.error('Unexpected error parsing MARC record')
+        logger.debug(err)
+        return None
+
+    return OutputManager._convertToJSON(instance)
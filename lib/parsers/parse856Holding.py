@@ -1,12 +1,51 @@
-import math
-from multiprocessing import Process, Pipe
-from multiprocessing.connection import wait
+from collections import namedtuple
+from functools import lru_cache
+import os
 import re
-import requests
 
+from helpers.cacheHelpers import LRUCache
 from helpers.errorHelpers import HoldingError
+from helpers.importHelpers import lazyImport
+from helpers.logHelpers import createLog
+from helpers.metricsHelpers import timed, timeStage
+from helpers.poolHelpers import mapIO
 from lib.dataModel import Link, Identifier
 
+requests = lazyImport('requests')
+
+logger = createLog('holding_parser')
+
+# HathiTrust volume lists keyed by catalog record ID and item redirect
+# locations keyed by item URL. These rarely change for a given key
+HATHI_TTL = float(os.environ.get('HATHI_CACHE_TTL', 86400))
+HATHI_VOLUME_CACHE = LRUCache(
+    maxSize=int(os.environ.get('HATHI_CACHE_SIZE', 512)), ttl=HATHI_TTL
+)
+HATHI_REDIRECT_CACHE = LRUCache(
+    maxSize=int(os.environ.get('HATHI_CACHE_SIZE', 512)) * 8, ttl=HATHI_TTL
+)
+
+# Access restriction status of Internet Archive items keyed by identifier.
+# Failed status requests are cached as restricted for a shorter period
+IA_STATUS_CACHE = LRUCache(
+    maxSize=int(os.environ.get('IA_CACHE_SIZE', 1024)),
+    ttl=float(os.environ.get('IA_CACHE_TTL', 86400))
+)
+IA_FAILURE_TTL = float(os.environ.get('IA_CACHE_FAILURE_TTL', 300))
+
+URIClass = namedtuple('URIClass', ['source', 'identifier', 'kind'])
+
+
+def compileDispatch(regexes, keywords):
+    """Compile a dict of regexes into a tuple of (keyword, key, pattern)
+    entries. The keyword is a plain substring that any URI matched by the
+    regex must contain, allowing most patterns to be skipped with a fast
+    substring check before any regex is run"""
+    return tuple(
+        (keywords[key], key, re.compile(regex))
+        for key, regex in regexes.items()
+    )
+
 
 class HoldingParser:
     EBOOK_REGEX = {
@@ -20,18 +59,36 @@ class HoldingParser:
         'gutenberg': r'gutenberg.org\/ebooks\/([0-9]+)$'
     }
 
-    URI_ID_REGEX = r'\/((?:(?!\/)[^.])+(?=$|\.[a-z]{3,4}$))'
+    EBOOK_DISPATCH = compileDispatch(EBOOK_REGEX, {
+        'gutenberg': 'gutenberg',
+        'internetarchive': 'archive',
+        'hathitrust': 'catalog.hathitrust'
+    })
+
+    ID_DISPATCH = compileDispatch(ID_REGEX, {
+        'oclc': 'oclc/',
+        'gutenberg': 'gutenberg'
+    })
 
-    HATHI_OCLC_REGEX = r'([a-z]+\/[a-z0-9]+)\.html$'
+    URI_ID_REGEX = re.compile(r'\/((?:(?!\/)[^.])+(?=$|\.[a-z]{3,4}$))')
 
-    HATHI_ID_REGEX = r'id=([a-z\.\/\$0-9]+)'
+    HATHI_OCLC_REGEX = re.compile(r'([a-z]+\/[a-z0-9]+)\.html$')
+
+    HATHI_ID_REGEX = re.compile(r'id=([a-z\.\/\$0-9]+)')
+
+    IA_ID_REGEX = re.compile(r'archive.org\/details\/([^\/?#]+)')
+
+    IA_RESTRICTION_PATH = '/metadata/access-restricted-item'
 
     HATHI_DOWNLOAD_URL = 'babel.hathitrust.org/cgi/imgsrv/download/pdf?id={}'
     HATHI_METADATA_URL = 'http://catalog.hathitrust.org/api/volumes/full/{}.json' 
-    def __init__(self, field, instance):
+    def __init__(self, field, instance, offline=False):
         self.field = field
         self.instance = instance
         self.source = 'unknown'
+        # Skip the HathiTrust and Internet Archive requests, treating
+        # Internet Archive items as restricted
+        self.offline = offline
     
     def parseField(self):
         if self.field.ind1 != '4':
@@ -45,17 +102,13 @@ class HoldingParser:
         self.identifier = self.loadURIid()
     
     def loadURIid(self):
-        """Regex to extract identifier from an URI. \/((?:(?!\/)[^.])+ matches
+        r"""Regex to extract identifier from an URI. \/((?:(?!\/)[^.])+ matches
         the path of the URI, excluding anything before the final slash (e.g.
         will match "1234" from http://test.com/1234) (?=$|\.[a-z]{3,4}$)) is a
         positive lookahead that excludes the file format from the identifier
         (so the above will still return "1234" if the URI ends in "1234.epub")
         """
-        uriGroup = re.search(self.URI_ID_REGEX, self.uri)
-        if uriGroup is not None:
-            self.identifier = uriGroup.group(1)
-        else:
-            self.identifier = self.uri
+        self.identifier = HoldingParser.classifyURI(self.uri).identifier
     
     def extractBookLinks(self):
         if self.matchEbook() is True:
@@ -68,124 +121,177 @@ class HoldingParser:
             )
 
     def matchEbook(self):
-        for source, regex in self.EBOOK_REGEX.items():
-            self.source = source
-            if re.search(regex, self.uri):
-                if source == 'internetarchive':
-                    if self.checkIAStatus() is True:
-                        return None
-                elif source == 'hathitrust':
-                    self.parseHathiLink()
-                    return None
-
-                self.instance.addFormat(**{
-                    'source': source,
-                    'content_type': 'ebook',
-                    'links': [
-                        self.createLink(
-                            self.uri, 'text/html',
-                            local=False, download=False, images=False, ebook=True
-                        )
-                    ],
-                    'identifiers': [Identifier(identifier=self.identifier, source='hathi')]
-                })
-                return True
-    
+        uriClass = HoldingParser.classifyURI(self.uri)
+        if uriClass.kind != 'ebook':
+            return None
+
+        source = self.source = uriClass.source
+        if source == 'internetarchive':
+            if self.offline or self.checkIAStatus() is True:
+                return None
+        elif source == 'hathitrust':
+            if not self.offline:
+                self.parseHathiLink()
+            return None
+
+        self.instance.addFormat(**{
+            'source': source,
+            'content_type': 'ebook',
+            'links': [
+                self.createLink(
+                    self.uri, 'text/html',
+                    local=False, download=False, images=False, ebook=True
+                )
+            ],
+            'identifiers': [Identifier(identifier=self.identifier, source='hathi')]
+        })
+        return True
+
     def matchIdentifier(self):
-        for idType, regex in self.ID_REGEX.items():
-            idGroup = re.search(regex, self.uri)
-            if idGroup is not None:
-                self.instance.addIdentifier(**{
-                    'type': idType,
-                    'identifier': idGroup.group(1),
-                    'weight': 0.8
-                })
-                return True
+        # Ebook URIs that do not produce a format, such as HathiTrust catalog
+        # URIs, can still contain an identifier
+        uriIdentifier = HoldingParser.identifyURI(self.uri)
+        if uriIdentifier is None:
+            return None
+
+        idType, identifier = uriIdentifier
+        self.instance.addIdentifier(**{
+            'type': idType,
+            'identifier': identifier,
+            'weight': 0.8
+        })
+        return True
+
+    @staticmethod
+    @lru_cache(maxsize=4096)
+    def classifyURI(uri):
+        """Classify a URI in a single pass, returning its source, identifier
+        and kind. Ebook links are returned with the identifier parsed from the
+        URI path, links containing an identifier with that identifier and any
+        other links with a kind of "link". Results are cached as the same URIs
+        recur both within and across records"""
+        # Only the final path segment can match URI_ID_REGEX, see loadURIid
+        uriGroup = HoldingParser.URI_ID_REGEX.search(uri, uri.rfind('/'))
+        uriID = uriGroup.group(1) if uriGroup is not None else uri
+
+        for keyword, source, pattern in HoldingParser.EBOOK_DISPATCH:
+            if keyword in uri and pattern.search(uri):
+                return URIClass(source, uriID, 'ebook')
+
+        uriIdentifier = HoldingParser.identifyURI(uri)
+        if uriIdentifier is not None:
+            return URIClass(*uriIdentifier, 'identifier')
+
+        return URIClass('unknown', uriID, 'link')
+
+    @staticmethod
+    @lru_cache(maxsize=4096)
+    def identifyURI(uri):
+        """Return the type and value of the first identifier found in a URI,
+        or None. This is checked for all URIs, including ebook links"""
+        for keyword, idType, pattern in HoldingParser.ID_DISPATCH:
+            if keyword in uri:
+                idGroup = pattern.search(uri)
+                if idGroup is not None:
+                    return idType, idGroup.group(1)
+
+        return None
 
     def checkIAStatus(self):
-        metadataURI = self.uri.replace('details', 'metadata')
-        metadataResp = requests.get(metadataURI)
-        if metadataResp.status_code == 200:
+        """Returns True if the Internet Archive item is access restricted (or
+        its status cannot be determined) and False if it is freely available
+        """
+        iaIDGroup = self.IA_ID_REGEX.search(self.uri)
+        iaID = iaIDGroup.group(1) if iaIDGroup else self.uri
+
+        restricted = IA_STATUS_CACHE.get(iaID)
+        if restricted is None:
+            restricted = self.fetchIARestriction()
+            if restricted is None:
+                restricted = True
+                IA_STATUS_CACHE.set(iaID, restricted, ttl=IA_FAILURE_TTL)
+            else:
+                IA_STATUS_CACHE.set(iaID, restricted)
+
+        return restricted
+
+    @timed('ia_request')
+    def fetchIARestriction(self):
+        """Request only the access-restricted-item field of the item metadata,
+        rather than the full metadata document. Returns None if the request
+        fails"""
+        metadataURI = '{}{}'.format(
+            self.uri.replace('details', 'metadata'), self.IA_RESTRICTION_PATH
+        )
+        try:
+            metadataResp = requests.get(metadataURI)
+            if metadataResp.status_code != 200:
+                return None
             iaData = metadataResp.json()
-            iaMeta = iaData['metadata']
-            if iaMeta.get('access-restricted-item', False) is False:
-                return False
-        
-        return True
-    
+        except (requests.exceptions.RequestException, ValueError) as err:
+            logger.warning('Unable to load IA status for %s', self.uri)
+            logger.debug(err)
+            return None
+
+        if 'error' in iaData:
+            return None
+
+        return iaData.get('result', False) is not False
+
     def parseHathiLink(self):
         if 'catalog' not in self.uri:
             return None
         self.loadCatalogLinks()
     
     def loadCatalogLinks(self):
-        hathiIDGroup = re.search(self.HATHI_OCLC_REGEX, self.uri)
+        hathiIDGroup = self.HATHI_OCLC_REGEX.search(self.uri)
         if hathiIDGroup:
             hathiID = hathiIDGroup.group(1)
             hathiItems = self.fetchHathiItems(hathiID)
             if hathiItems:
-                self.startHathiMultiprocess(hathiItems)
+                self.startHathiFetch(hathiItems)
     
-    def startHathiMultiprocess(self, hathiItems):
-        processes = []
-        outPipes = []
-        cores = 4
-
-        chunkSize = math.ceil(len(hathiItems) / cores)
-
-        for i in range(cores):
-            start = i * chunkSize
-            end = start + chunkSize
-
-            pConn, cConn = Pipe(duplex=False)
-            proc = Process(
-                target=self.processHathiChunk,
-                args=(hathiItems[start:end], cConn)
-            )
-            processes.append(proc)
-            outPipes.append(pConn)
-            proc.start()
-            cConn.close()
-
-        while outPipes:
-            for p in wait(outPipes):
-                try:
-                    newItem = p.recv()
-                    if newItem == 'DONE':
-                        outPipes.remove(p)
-                    else:
-                        self.instance.addFormat(**newItem) 
-                except EOFError:
-                    outPipes.remove(p)
-
-        for proc in processes:
-            proc.join()
+    def startHathiFetch(self, hathiItems):
+        """Load the links for each HathiTrust item through the shared I/O pool
+        and add a format to the instance for each item with usable links"""
+        for newItem in mapIO(self.loadItemLinks, hathiItems):
+            if newItem is not None:
+                self.instance.addFormat(**newItem)
 
     def fetchHathiItems(self, hathiID):
+        hathiItems = HATHI_VOLUME_CACHE.get(hathiID)
+        if hathiItems is not None:
+            return hathiItems
+
         apiURL = self.HATHI_METADATA_URL.format(
             hathiID
         )
-        apiResp = requests.get(apiURL)
+        with timeStage('hathi_request'):
+            apiResp = requests.get(apiURL)
         if apiResp.status_code == 200:
             catalogData = apiResp.json()
-            return catalogData.get('items', [])
+            hathiItems = catalogData.get('items', [])
+            HATHI_VOLUME_CACHE.set(hathiID, hathiItems)
+            return hathiItems
     
-    def processHathiChunk(self, hathiItems, cConn):
-        for recItem in hathiItems:
-            newItem = self.getNewItemLinks(recItem)
-            if newItem is not None:
-                cConn.send(newItem)
-        
-        cConn.send('DONE')
-        cConn.close()
+    def loadItemLinks(self, recItem):
+        """Wraps getNewItemLinks so that a single failed item request does not
+        prevent the remaining items from being loaded"""
+        try:
+            return self.getNewItemLinks(recItem)
+        except Exception as err:
+            logger.error(
+                'Unable to load links for HathiTrust item %s',
+                recItem.get('itemURL', None)
+            )
+            logger.debug(err)
 
     def getNewItemLinks(self, recItem):
         if recItem.get('rightsCode', 'ic') in ['ic', 'icus', 'ic-world', 'und']:
             return
-        redirectURL = requests.head(recItem['itemURL'])
-        realURL = redirectURL.headers['Location'].replace('https://', '')
+        realURL = self.resolveItemURL(recItem['itemURL'])
 
-        hathiID = re.search(self.HATHI_ID_REGEX, realURL).group(1)
+        hathiID = self.HATHI_ID_REGEX.search(realURL).group(1)
         downloadURL = self.HATHI_DOWNLOAD_URL.format(hathiID)
 
         return {
@@ -204,6 +310,19 @@ class HoldingParser:
             'identifiers': [Identifier(identifier=hathiID, source='hathi')]
         }
 
+    @staticmethod
+    def resolveItemURL(itemURL):
+        """Follow the redirect from a HathiTrust item URL to the location of
+        the item itself, caching the result"""
+        realURL = HATHI_REDIRECT_CACHE.get(itemURL)
+        if realURL is None:
+            with timeStage('hathi_request'):
+                redirectURL = requests.head(itemURL)
+            realURL = redirectURL.headers['Location'].replace('https://', '')
+            HATHI_REDIRECT_CACHE.set(itemURL, realURL)
+
+        return realURL
+
     @staticmethod
     def createLink(uri, mediaType, local=False, download=False, images=False, ebook=False):
         return Link(
@@ -1,13 +1,20 @@
+from collections import OrderedDict, defaultdict
 from datetime import datetime
+import os
 import re
-import requests
 from urllib.parse import quote_plus
 
+from helpers.cacheHelpers import LRUCache
 from helpers.logHelpers import createLog
+from helpers.metricsHelpers import timed, timeStage
 from helpers.errorHelpers import HoldingError
+from helpers.importHelpers import lazyImport
+from helpers.poolHelpers import mapIO
 from lib.dataModel import InstanceRecord, Agent, Link, Identifier
 from lib.parsers.parse856Holding import HoldingParser
 
+requests = lazyImport('requests')
+
 logger = createLog('classify_parse')
 
 MEASUREMENT_TIME = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
@@ -22,118 +29,137 @@ SUBJECT_INDICATORS = {
     '6': 'rvm',
 }
 
+VIAF_LOOKUP_URL = 'https://dev-platform.nypl.org/api/v0.1/research-now/viaf-lookup?queryName='  # noqa: E501
+
+CORPORATE_ROLES = ['publisher', 'manufacturer']
+
+# Resolved VIAF data keyed by agent name and query type. Names that VIAF
+# could not resolve are cached as empty dicts for a shorter period
+VIAF_CACHE = LRUCache(
+    maxSize=int(os.environ.get('VIAF_CACHE_SIZE', 1024)),
+    ttl=float(os.environ.get('VIAF_CACHE_TTL', 86400))
+)
+VIAF_MISS_TTL = float(os.environ.get('VIAF_CACHE_MISS_TTL', 3600))
+
+
+# Rules for extracting subfield values into the instance record, each a tuple
+# of (tag, attribute, subfield[, type or role]). Values are set on the record
+# in the order of these rules
+FIELD_RULES = [
+    # Code Fields (Identifiers)
+    ('010', 'identifiers', 'a', 'lccn'),
+    ('020', 'identifiers', 'a', 'isbn'),
+    ('022', 'identifiers', 'a', 'issn'),
+    ('050', 'identifiers', 'a', 'lcc'),
+    ('082', 'identifiers', 'a', 'ddc'),
+    ('010', 'identifiers', 'z', 'lccn'),
+    ('020', 'identifiers', 'z', 'isbn'),
+    ('022', 'identifiers', 'z', 'issn'),
+    ('050', 'identifiers', 'z', 'lcc'),
+    ('082', 'identifiers', 'z', 'ddc'),
+    # Title Fields
+    ('210', 'alt_titles', 'a'),
+    ('222', 'alt_titles', 'a'),
+    ('242', 'alt_titles', 'a'),
+    ('246', 'alt_titles', 'a'),
+    ('247', 'alt_titles', 'a'),
+    ('245', 'title', 'a'),
+    ('245', 'sub_title', 'b'),
+    # Edition Fields
+    ('250', 'edition_statement', 'a'),
+    ('250', 'edition_statement', 'b'),
+    ('260', 'pub_place', 'a'),
+    ('260', 'pub_date', 'c'),
+    ('260', 'agents', 'b', 'publisher'),
+    ('260', 'agents', 'f', 'manufacturer'),
+    ('264', 'copyright_date', 'c'),
+    # Physical Details
+    # TODO Load fields into items/measurements?
+    ('300', 'extent', 'a'),
+    ('300', 'extent', 'b'),
+    ('300', 'extent', 'c'),
+    ('300', 'extent', 'e'),
+    ('300', 'extent', 'f'),
+    # Series Details
+    ('490', 'series', 'a'),
+    ('490', 'series_position', 'v'),
+    # Notes/Description details
+    # TODO What fields should we bring in?
+    ('505', 'table_of_contents', 'a')
+]
+
+SUBJECT_FIELDS = ['600', '610', '648', '650', '651', '655', '656', '657']
 
-def readFromMARC(marcRecord):
-    """Parse marcalyx Record object representing oclc record"""
+# All tags read by readFromMARC, allowing parsers to skip other fields
+MARC_TAGS = frozenset(
+    ['001', '008', '041', '856']
+    + [rule[0] for rule in FIELD_RULES]
+    + SUBJECT_FIELDS
+)
+
+
+def compileFieldPlan(rules):
+    """Group extraction rules by tag so that each field only needs to be
+    visited once. Returns a list of (tag, [(position, rule)]) tuples, where
+    position is the index of the rule in the original list"""
+    plan = OrderedDict()
+    for position, rule in enumerate(rules):
+        plan.setdefault(rule[0], []).append((position, rule))
+
+    return list(plan.items())
+
+
+FIELD_PLAN = compileFieldPlan(FIELD_RULES)
+
+
+@timed('read_marc')
+def readFromMARC(marcRecord, offline=False):
+    """Parse marcalyx Record object representing oclc record. If offline is
+    set the record is parsed without enriching it from VIAF, HathiTrust or
+    the Internet Archive, so that no network requests are made"""
     logger.debug('Parsing Returned Edition')
 
     instance = InstanceRecord()
 
+    fields = indexFields(marcRecord)
+
     # Control Fields
-    oclcNumber = marcRecord['001'][0].value
+    oclcNumber = fields['001'][0].value
     instance.addIdentifier(**{
         'type': 'oclc',
         'identifier': oclcNumber,
         'weight': 1
     })
 
-    parsedDate = parse008ControlField(marcRecord['008'][0].value, instance)
+    parsedDate = parse008ControlField(fields['008'][0].value, instance)
 
-    # Code Fields (Identifiers)
-    logger.debug('Parsing 0X0-0XX Fields')
-    controlData = [
-        ('010', 'identifiers', 'a', 'lccn'),
-        ('020', 'identifiers', 'a', 'isbn'),
-        ('022', 'identifiers', 'a', 'issn'),
-        ('050', 'identifiers', 'a', 'lcc'),
-        ('082', 'identifiers', 'a', 'ddc'),
-        ('010', 'identifiers', 'z', 'lccn'),
-        ('020', 'identifiers', 'z', 'isbn'),
-        ('022', 'identifiers', 'z', 'issn'),
-        ('050', 'identifiers', 'z', 'lcc'),
-        ('082', 'identifiers', 'z', 'ddc')
-    ]
-    for field in controlData:
-        extractSubfieldValue(marcRecord, instance, field)
+    # Code, Title, Edition, Extent, Series and TOC Fields
+    logger.debug('Parsing 0X0-505 Fields')
+    agentQueue = []
+    extractFields(fields, instance, FIELD_RULES, FIELD_PLAN, agentQueue)
 
     # Language Fields
-    if len(marcRecord['041']) > 0:
-        for lang in marcRecord['041'][0].subfield('a'):
+    if len(fields['041']) > 0:
+        for lang in fields['041'][0].subfield('a'):
             if instance.language is None:
                 instance.language = lang.value
             else:
                 instance.language += ';{}'.format(lang.value)
 
-    # Title Fields
-    logger.debug('Parsing 21X-24X Fields')
-    titleData = [
-        ('210', 'alt_titles', 'a'),
-        ('222', 'alt_titles', 'a'),
-        ('242', 'alt_titles', 'a'),
-        ('246', 'alt_titles', 'a'),
-        ('247', 'alt_titles', 'a'),
-        ('245', 'title', 'a'),
-        ('245', 'sub_title', 'b')
-    ]
-    for field in titleData:
-        extractSubfieldValue(marcRecord, instance, field)
+    # Agents found in the edition fields are resolved against VIAF together
+    logger.debug('Resolving %s agents', len(agentQueue))
+    instance.agents.extend(resolveAgents(agentQueue, offline))
 
-    # Edition Fields
-    logger.debug('Parsing Edition (250 & 260) Fields')
-    editionData = [
-        ('250', 'edition_statement', 'a'),
-        ('250', 'edition_statement', 'b'),
-        ('260', 'pub_place', 'a'),
-        ('260', 'pub_date', 'c'),
-        ('260', 'agents', 'b', 'publisher'),
-        ('260', 'agents', 'f', 'manufacturer'),
-        ('264', 'copyright_date', 'c')
-    ]
-    for field in editionData:
-        extractSubfieldValue(marcRecord, instance, field)
-
-    parsePubDate(instance.dates, parsedDate, instance)
-
-    # Physical Details
-    # TODO Load fields into items/measurements?
-    logger.debug('Parsing Extent (300) Field')
-    extentData = [
-        ('300', 'extent', 'a'),
-        ('300', 'extent', 'b'),
-        ('300', 'extent', 'c'),
-        ('300', 'extent', 'e'),
-        ('300', 'extent', 'f')
-    ]
-    for field in extentData:
-        extractSubfieldValue(marcRecord, instance, field)
-
-    # Series Details
-    logger.debug('Parsing Series (490) Field')
-    seriesData = [
-        ('490', 'series', 'a'),
-        ('490', 'series_position', 'v')
-    ]
-    for field in seriesData:
-        extractSubfieldValue(marcRecord, instance, field)
-
-    # Notes/Description details
-    # TODO What fields should we bring in?
-    logger.debug('Parsing TOC (505) Field')
-    tocData = [
-        ('505', 'table_of_contents', 'a')
-    ]
-    for field in tocData:
-        extractSubfieldValue(marcRecord, instance, field)
+    parsePubDate(parsedDate, instance)
 
     # Subject Details
     logger.debug('Parsing 6XX Subject Fields')
-    subjectData = ['600', '610', '648', '650', '651', '655', '656', '657']
-    for subjectType in subjectData:
-        extractSubjects(marcRecord, instance, subjectType)
+    for subjectType in SUBJECT_FIELDS:
+        extractSubjects(fields, instance, subjectType)
 
     # Eletronic Holding Details
     logger.debug('Parsing 856 (Electronic Holding) Field')
-    extractHoldingsLinks(marcRecord['856'], instance)
+    extractHoldingsLinks(fields['856'], instance, offline)
 
     # TODO Load data for these fields
     # 100/110/111
@@ -144,22 +170,28 @@ def readFromMARC(marcRecord):
     return instance
 
 
+def indexFields(marcRecord):
+    """Group the fields of a record by tag in a single pass, rather than
+    scanning all fields each time a tag is accessed"""
+    fields = defaultdict(list)
+    for field in marcRecord.fields:
+        fields[field.tag].append(field)
+
+    return fields
+
+
 def parse008ControlField(fieldData, instance):
     instance.language = fieldData[35:38]
-    logger.debug('Found language code {} in 008 field'.format(
-        instance.language)
-    )
+    logger.debug('Found language code %s in 008 field', instance.language)
 
     return fieldData[7:11]
 
 
-def parsePubDate(dates, parsedPubDate, instance):
-    try:
-        pubDate = list(filter(
-            lambda x: x['date_type'] == 'pub_date', dates
-        ))[0]
+def parsePubDate(parsedPubDate, instance):
+    pubDate = instance.getDate('pub_date')
+    if pubDate is not None:
         pubDate.date_range = parsedPubDate
-    except IndexError:
+    else:
         instance.addDate(**{
             'display_date': parsedPubDate,
             'date_range': parsedPubDate,
@@ -167,14 +199,14 @@ def parsePubDate(dates, parsedPubDate, instance):
         })
 
 
-def extractHoldingsLinks(holdings, instance):
+def extractHoldingsLinks(holdings, instance, offline=False):
     for holding in holdings:
         try:
-            parse856 = HoldingParser(holding, instance)
+            parse856 = HoldingParser(holding, instance, offline=offline)
             parse856.parseField()
             parse856.extractBookLinks()
         except HoldingError as err:
-            logger.error('Unable to parse 856 field {}'.format(holding))
+            logger.error('Unable to parse 856 field %s', holding)
             logger.debug(err)
 
 def extractSubjects(data, instance, field):
@@ -212,9 +244,9 @@ def extractSubjects(data, instance, field):
             try:
                 subject['authority'] = SUBJECT_INDICATORS[subj.ind2]
             except KeyError as err:
-                logger.error('Unknown subject authority found for {}'.format(
-                    instance
-                ))
+                logger.error(
+                    'Unknown subject authority found for %s', instance
+                )
                 logger.debug(err)
         else:
             try:
@@ -241,62 +273,120 @@ def extractSubjects(data, instance, field):
         })
 
 
-def extractSubfieldValue(data, record, fieldData):
-    field = fieldData[0]
+def extractFields(fields, record, rules, plan, agentQueue=None):
+    """Extract the values for all rules from the record's fields. Each field
+    is visited once and its subfields read once, with the values for every
+    rule on that tag collected in the same pass. Values are then set on the
+    record in the order of the rules"""
+    ruleValues = [[] for _ in rules]
+    for tag, tagRules in plan:
+        missing = set()
+        for fieldInstance in fields[tag]:
+            subfields = {}
+            for subfield in fieldInstance.subfields:
+                subfields.setdefault(subfield.code, subfield.value)
+
+            for position, rule in tagRules:
+                if position in missing:
+                    continue
+                try:
+                    ruleValues[position].append(subfields[rule[2]])
+                except KeyError:
+                    # Later instances of the field are skipped for this rule
+                    logger.error(
+                        'Could not load subfield %s for field %s', rule[2], tag
+                    )
+                    missing.add(position)
+
+    for rule, values in zip(rules, ruleValues):
+        for fieldValue in values:
+            setFieldValue(record, rule, fieldValue, agentQueue)
+
+
+def setFieldValue(record, fieldData, fieldValue, agentQueue=None):
+    """Set the value of a MARC subfield on the record. If an agentQueue is
+    provided, agent names and roles are added to it to be resolved later,
+    otherwise they are resolved immediately"""
     attr = fieldData[1]
-    subfield = fieldData[2]
-    try:
-        for fieldInstance in data[field]:
-            fieldValue = fieldInstance.subfield(subfield)[0].value
-            if attr == 'agents':
-                role = fieldData[3]
-                record.agents.append(buildAgent(fieldValue, role))
-            elif attr == 'identifiers':
-                controlField = fieldData[3]
-                record.addIdentifier(**{
-                    'type': controlField,
-                    'identifier': fieldValue.strip(),
-                    'weight': 1
-                })
-            elif attr in ['pub_date', 'copyright_date']:
-                record.addDate(**{
-                    'display_date': fieldValue,
-                    'date_range': fieldValue,
-                    'date_type': attr
-                })
-            else:
-                if record[attr] is None:
-                    record[attr] = fieldValue
-                elif type(record[attr]) is list:
-                    record[attr].append(fieldValue)
-                elif type(record[attr]) is str:
-                    record[attr] += '; {}'.format(fieldValue)
-    except IndexError as err:
-        logger.error('Could not load subfield {} for field {}'.format(
-            subfield,
-            field
-        ))
-        logger.debug(err)
+    if attr == 'agents':
+        role = fieldData[3]
+        if agentQueue is not None:
+            agentQueue.append((fieldValue, role))
+        else:
+            record.agents.append(buildAgent(fieldValue, role))
+    elif attr == 'identifiers':
+        controlField = fieldData[3]
+        record.addIdentifier(**{
+            'type': controlField,
+            'identifier': fieldValue.strip(),
+            'weight': 1
+        })
+    elif attr in ['pub_date', 'copyright_date']:
+        record.addDate(**{
+            'display_date': fieldValue,
+            'date_range': fieldValue,
+            'date_type': attr
+        })
+    else:
+        if record[attr] is None:
+            record[attr] = fieldValue
+        elif type(record[attr]) is list:
+            record[attr].append(fieldValue)
+        elif type(record[attr]) is str:
+            record[attr] += '; {}'.format(fieldValue)
+
+
+def resolveAgents(agentQueue, offline=False):
+    """Build agents for a list of (name, role) tuples, querying VIAF for
+    all of them concurrently. Agents are returned in the order received. If
+    offline is set VIAF is not queried"""
+    if offline:
+        return [Agent(name=name, role=role) for name, role in agentQueue]
+
+    return mapIO(lambda agent: buildAgent(*agent), agentQueue)
+
 
 def buildAgent(name, role):
 
     newAgent = Agent(name=name, role=role)
 
-    queryStr = '{}{}'.format(
-        'https://dev-platform.nypl.org/api/v0.1/research-now/viaf-lookup?queryName=',
-        quote_plus(name)
-    )
-    if role in ['publisher', 'manufacturer']:
+    viafData = resolveVIAF(name, role in CORPORATE_ROLES)
+    if 'viaf' in viafData:
+        if viafData['name'] != name:
+            newAgent.aliases.append(name)
+            newAgent.name = viafData.get('name', '')
+        newAgent.viaf = viafData.get('viaf', None)
+        newAgent.lcnaf = viafData.get('lcnaf', None)
+
+    return newAgent
+
+
+def resolveVIAF(name, corporate):
+    """Query the VIAF lookup service for an agent name, returning the name,
+    viaf and lcnaf fields of the response, or an empty dict if no VIAF record
+    was found. Responses, including misses, are cached between records"""
+    cacheKey = (name, corporate)
+    viafData = VIAF_CACHE.get(cacheKey)
+    if viafData is not None:
+        return viafData
+
+    queryStr = '{}{}'.format(VIAF_LOOKUP_URL, quote_plus(name))
+    if corporate is True:
         queryStr = '{}&{}'.format(queryStr, 'queryType=corporate')
 
-    viafResp = requests.get(queryStr)
-    responseJSON = viafResp.json()
+    with timeStage('viaf_request'):
+        viafResp = requests.get(queryStr)
+        responseJSON = viafResp.json()
     logger.debug(responseJSON)
     if 'viaf' in responseJSON:
-        if responseJSON['name'] != name:
-            newAgent.aliases.append(name)
-            newAgent.name = responseJSON.get('name', '')
-        newAgent.viaf = responseJSON.get('viaf', None)
-        newAgent.lcnaf = responseJSON.get('lcnaf', None)
+        viafData = {
+            'name': responseJSON.get('name', ''),
+            'viaf': responseJSON.get('viaf', None),
+            'lcnaf': responseJSON.get('lcnaf', None)
+        }
+        VIAF_CACHE.set(cacheKey, viafData)
+    else:
+        viafData = {}
+        VIAF_CACHE.set(cacheKey, viafData, ttl=VIAF_MISS_TTL)
 
-    return newAgent
+    return viafData
@@ -0,0 +1,137 @@
+from io import BytesIO
+
+from helpers.errorHelpers import OCLCError
+from helpers.importHelpers import lazyImport
+from helpers.logHelpers import createLog
+
+etree = lazyImport('lxml.etree')
+
+logger = createLog('compact_marc')
+
+FIELD_TAGS = ['{*}leader', '{*}controlfield', '{*}datafield', '{*}record']
+
+
+class CompactSubfield:
+    __slots__ = ('code', 'value')
+
+    def __init__(self, code, value):
+        self.code = code
+        self.value = value
+
+    def __repr__(self):
+        return '${}{}'.format(self.code, self.value)
+
+
+class CompactField:
+    """Minimal MARC field exposing the same attributes and methods as the
+    marcalyx ControlField and DataField classes used by readFromMARC"""
+    __slots__ = ('tag', 'ind1', 'ind2', 'value', 'subfields')
+
+    def __init__(self, tag, ind1=None, ind2=None, value=None, subfields=None):
+        self.tag = tag
+        self.ind1 = ind1
+        self.ind2 = ind2
+        self.subfields = subfields if subfields is not None else []
+        if value is None and len(self.subfields) > 0:
+            value = ' '.join([s.value for s in self.subfields])
+        self.value = value
+
+    def subfield(self, code):
+        return [s for s in self.subfields if s.code == code]
+
+    def __getitem__(self, code):
+        return self.subfield(code)
+
+    def __repr__(self):
+        if self.ind1 is None:
+            return '{}   {}'.format(self.tag, self.value)
+
+        return '{} {}{}{}'.format(
+            self.tag,
+            '#' if self.ind1 == ' ' else self.ind1,
+            '#' if self.ind2 == ' ' else self.ind2,
+            ''.join([str(s) for s in self.subfields])
+        )
+
+
+class CompactRecord:
+    """Minimal MARC record exposing the same interface as a marcalyx Record,
+    holding only the fields that were requested when it was parsed"""
+    __slots__ = ('leader', 'fields')
+
+    def __init__(self, leader=None, fields=None):
+        self.leader = leader
+        self.fields = fields if fields is not None else []
+
+    def field(self, tag):
+        return [f for f in self.fields if f.tag == tag]
+
+    def __getitem__(self, tag):
+        return self.field(tag)
+
+
+def parseCompactMARC(marcData, tags=None):
+    """Parses a single raw MARCXML record into a CompactRecord, keeping only
+    the fields with the supplied tags. This is an alternative to parseMARC
+    that avoids building a full lxml tree and marcalyx record"""
+    if isinstance(marcData, str):
+        marcData = marcData.encode('utf-8')
+
+    try:
+        return next(iterCompactRecords(BytesIO(marcData), tags))
+    except etree.XMLSyntaxError as err:
+        logger.error('OCLC Catalog returned invalid XML')
+        logger.debug(err)
+        raise OCLCError('Received invalid XML from OCLC service')
+    except StopIteration:
+        raise OCLCError('MARCXML did not contain a record')
+
+
+def iterCompactRecords(source, tags=None):
+    """Incrementally parse a MARCXML source, either a single record or a
+    collection, yielding a CompactRecord for each record. The source may be
+    a file path or a file-like object. Each field element is discarded once
+    it has been read so memory use does not grow with the size of records or
+    of the collection"""
+    tags = frozenset(tags) if tags is not None else None
+
+    record = CompactRecord()
+    for _, elem in etree.iterparse(source, events=('end',), tag=FIELD_TAGS):
+        elemTag = elem.tag
+        localName = elemTag[elemTag.rfind('}') + 1:]
+
+        if localName == 'record':
+            yield record
+            record = CompactRecord()
+            # Free the record and any already processed records
+            elem.clear()
+            while elem.getprevious() is not None:
+                del elem.getparent()[0]
+            continue
+        elif localName == 'leader':
+            record.leader = elem.text
+        else:
+            tag = elem.get('tag')
+            if tags is None or tag in tags:
+                record.fields.append(readField(elem, localName, tag))
+
+        # Free the children of the parsed field, leaving only an empty
+        # element until the record is complete
+        elem.clear()
+
+
+def readField(elem, localName, tag):
+    """Create a CompactField from a controlfield or datafield element"""
+    if localName == 'controlfield':
+        return CompactField(tag, value=elem.text)
+
+    return CompactField(
+        tag,
+        ind1=elem.get('ind1'),
+        ind2=elem.get('ind2'),
+        subfields=[
+            CompactSubfield(sub.get('code'), sub.text)
+            for sub in elem.iterchildren('{*}subfield')
+            if sub.text is not None
+        ]
+    )
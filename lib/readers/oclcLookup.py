@@ -1,11 +1,18 @@
-import requests
-from requests.exceptions import Timeout, ConnectionError
+import logging
 import os
-from lxml import etree
-import marcalyx
+import threading
 
+from helpers.cacheHelpers import createCache
 from helpers.errorHelpers import OCLCError
+from helpers.importHelpers import lazyImport
 from helpers.logHelpers import createLog
+from helpers.metricsHelpers import timed
+from lib.readers.compactMARC import parseCompactMARC
+from lib.parsers.parseOCLC import MARC_TAGS
+
+requests = lazyImport('requests')
+etree = lazyImport('lxml.etree')
+marcalyx = lazyImport('marcalyx')
 
 logger = createLog('oclc_lookup')
 
@@ -13,27 +20,98 @@ NAMESPACE = {
     None: 'http://classify.oclc.org'
 }
 
+SESSION = None
+SESSION_LOCK = threading.Lock()
+
+# Raw MARCXML responses keyed by OCLC#. Any object implementing get/set can
+# be assigned here to replace the default cache
+MARC_CACHE = createCache('MARC_CACHE', maxSize=256, ttl=86400)
+
+
+def getSession():
+    """Returns a shared requests Session for the OCLC Catalog service. This
+    keeps connections to worldcat.org alive between lookups, including across
+    warm invocations of the Lambda. The pool blocks once all of its
+    connections are in use, so no more than the configured concurrency of
+    lookups are made at once however many threads request them"""
+    global SESSION
+    with SESSION_LOCK:
+        if SESSION is None:
+            adapter = requests.adapters.HTTPAdapter(
+                pool_connections=1, pool_maxsize=getConcurrency(),
+                pool_block=True
+            )
+            session = requests.Session()
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+            SESSION = session
+
+    return SESSION
+
+
+def getConcurrency():
+    """Maximum number of concurrent lookups to the OCLC Catalog, which is
+    the number of connections in the session pool"""
+    return max(int(os.environ.get('OCLC_CONCURRENCY', 10)), 1)
+
 
 def lookupRecord(identifier):
     """Looks up an OCLC# in the OCLC Catalog API.
     Returns a MARCXML record."""
 
-    # TODO Cache this somewhere?
-    queryURL = createURL(identifier)
-    logger.info('Fetching data for url: {}'.format(queryURL))
+    marcData = getCachedMARCXML(identifier)
+    if marcData is not None:
+        return parseMARC(marcData)
 
-    # Load Query Response from OCLC Classify
-    logger.debug('Making OCLC Catalog request for {}'.format(identifier))
-    marcData = catalogLookup(queryURL)
+    marcData = fetchMARCXML(identifier)
 
     # Parse response, and if it is a Multi-Work response, parse further
     logger.debug('Parsing Classify Response')
-    return parseMARC(marcData)
+    record = parseMARC(marcData)
+
+    # Only cache responses that could be parsed, so that an error page from
+    # OCLC is not returned for the life of the cache entry
+    cacheMARCXML(identifier, marcData)
+    return record
 
 
+def getCachedMARCXML(identifier):
+    """Returns the raw MARCXML for an OCLC# if it has been fetched recently,
+    otherwise None"""
+    marcData = MARC_CACHE.get(identifier)
+    if marcData is not None:
+        logger.debug('Loaded MARCXML for %s from cache', identifier)
+
+    return marcData
+
+
+def cacheMARCXML(identifier, marcData):
+    """Store the raw MARCXML for an OCLC#. This should only be called once
+    the MARCXML has been parsed successfully"""
+    MARC_CACHE.set(identifier, marcData)
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug('MARC cache stats %s', MARC_CACHE.stats())
+
+
+def fetchMARCXML(identifier):
+    """Returns the raw MARCXML for an OCLC# from the OCLC Catalog API"""
+    queryURL = createURL(identifier)
+    logger.info('Fetching data for url: %s', queryURL)
+
+    # Load Query Response from OCLC Classify
+    logger.debug('Making OCLC Catalog request for %s', identifier)
+    return catalogLookup(queryURL)
+
+
+@timed('marc_parse')
 def parseMARC(marcData):
     """Parses raw MARCXML data into a marcalyx record that can be used
-    to extract all metadata from record"""
+    to extract all metadata from record. If MARC_PARSER is set to "compact"
+    a streaming parser is used instead, which only keeps the fields read by
+    readFromMARC"""
+    if os.environ.get('MARC_PARSER', 'marcalyx') == 'compact':
+        return parseCompactMARC(marcData, MARC_TAGS)
+
     try:
         parseMARC = etree.fromstring(marcData.encode('utf-8'))
     except etree.XMLSyntaxError as err:
@@ -51,18 +129,23 @@ def parseMARC(marcData):
     return record
 
 
+@timed('oclc_fetch')
 def catalogLookup(queryURL):
     """Execute a request against the OCLC Catalog service"""
+    session = getSession()
     try:
-        classifyResp = requests.get(queryURL, timeout=2)
-    except (Timeout, ConnectionError):
-        logger.warning('Failed to query URL {}'.format(queryURL))
-        classifyResp = requests.get(queryURL, timeout=5)
+        classifyResp = session.get(queryURL, timeout=2)
+    except (
+        requests.exceptions.Timeout, requests.exceptions.ConnectionError
+    ):
+        logger.warning('Failed to query URL %s', queryURL)
+        classifyResp = session.get(queryURL, timeout=5)
 
     if classifyResp.status_code != 200:
-        logger.error('OCLC Catalog Request failed with status {}'.format(
+        logger.error(
+            'OCLC Catalog Request failed with status %s',
             classifyResp.status_code
-        ))
+        )
         logger.debug(classifyResp.text)
         raise OCLCError('Failed to reach OCLC Catalog Service')
 
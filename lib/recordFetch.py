@@ -1,7 +1,15 @@
+from concurrent.futures import ThreadPoolExecutor
+import json
+import os
+
 from helpers.errorHelpers import OCLCError
 from helpers.logHelpers import createLog
-from lib.readers.oclcLookup import lookupRecord
+from helpers.metricsHelpers import propagateMetrics, timeStage
+from lib.readers.oclcLookup import (
+    lookupRecord, fetchMARCXML, getCachedMARCXML, cacheMARCXML
+)
 from lib.parsers.parseOCLC import readFromMARC
+from lib.parsePool import ParsePool, getParseProcesses
 
 logger = createLog('enhancer')
 
@@ -13,13 +21,122 @@ def fetchData(identifier, idenType):
         logger.error('Catalog lookup requires an OCLC identifier')
         raise OCLCError('OCLC Catalog lookup requires an OCLC Number')
 
-    logger.info('Loading MARC for record {}'.format(identifier))
+    logger.info('Loading MARC for record %s', identifier)
 
     try:
         marcData = lookupRecord(identifier)
         parsedData = readFromMARC(marcData)
     except OCLCError as err:
-        logger.error('OCLC Query failed with message: {}'.format(err.message))
+        logger.error('OCLC Query failed with message: %s', err.message)
         raise err
 
     return parsedData
+
+
+def fetchBatch(identifiers, idenType, workers=None):
+    """Takes a list of identifiers and concurrently queries the OCLC Lookup
+    API for each one. Returns a dict keyed by identifier containing a status
+    code and either the parsed record or an error message, so that a single
+    failed lookup does not fail the entire batch. Identifiers repeated in the
+    batch are only looked up once and appear once in the results."""
+    if workers is None:
+        workers = int(os.environ.get('BATCH_WORKERS', 10))
+
+    uniqueIdentifiers = list(dict.fromkeys(identifiers))
+    if len(uniqueIdentifiers) < len(identifiers):
+        logger.info(
+            'Skipping %s duplicate identifiers in batch',
+            len(identifiers) - len(uniqueIdentifiers)
+        )
+    identifiers = uniqueIdentifiers
+
+    logger.info('Loading MARC for batch of %s records', len(identifiers))
+
+    processes = getParseProcesses()
+    if processes > 0:
+        return fetchBatchParallel(identifiers, idenType, workers, processes)
+
+    with ThreadPoolExecutor(max_workers=max(workers, 1)) as executor:
+        results = executor.map(
+            propagateMetrics(lambda iden: fetchBatchRecord(iden, idenType)),
+            identifiers
+        )
+        return dict(zip(identifiers, results))
+
+
+def fetchBatchRecord(identifier, idenType):
+    """Fetch a single record as part of a batch, capturing any error as a
+    per-record status block rather than raising it"""
+    try:
+        return {'status': 200, 'data': fetchData(identifier, idenType)}
+    except OCLCError as err:
+        return {'status': 500, 'data': {'message': err.message}}
+    except Exception as err:
+        logger.error('Unexpected error fetching record %s', identifier)
+        logger.debug(err)
+        return {'status': 500, 'data': {'message': str(err)}}
+
+
+def fetchBatchParallel(identifiers, idenType, workers, processes):
+    """Fetch the MARCXML for a batch of identifiers concurrently and then
+    parse the records across a pool of processes, returning the same
+    per-identifier result blocks as fetchBatch. Errors fetching or parsing
+    a record only fail that record. This is only used outside of AWS Lambda,
+    see getParseProcesses"""
+    if idenType != 'oclc':
+        logger.error('Catalog lookup requires an OCLC identifier')
+        errorBlock = {
+            'status': 500,
+            'data': {'message': 'OCLC Catalog lookup requires an OCLC Number'}
+        }
+        return {iden: errorBlock for iden in identifiers}
+
+    with ThreadPoolExecutor(max_workers=max(workers, 1)) as executor:
+        marcRecords = list(executor.map(
+            propagateMetrics(fetchBatchMARCXML), identifiers
+        ))
+
+    results = {}
+    toParse = []
+    for identifier, (marcData, cached) in zip(identifiers, marcRecords):
+        if isinstance(marcData, dict):
+            results[identifier] = marcData
+        else:
+            toParse.append((identifier, marcData, cached))
+
+    with timeStage('parse_pool'), ParsePool(processes, ordered=False) as pool:
+        parsedRecords = pool.parse(marcData for _, marcData, _ in toParse)
+        for position, jsonRecord in parsedRecords:
+            identifier, marcData, cached = toParse[position]
+            if jsonRecord is None:
+                results[identifier] = {
+                    'status': 500,
+                    'data': {'message': 'Unable to parse MARC record'}
+                }
+            else:
+                if not cached:
+                    cacheMARCXML(identifier, marcData)
+                results[identifier] = {
+                    'status': 200, 'data': json.loads(jsonRecord)
+                }
+
+    return {iden: results[iden] for iden in identifiers}
+
+
+def fetchBatchMARCXML(identifier):
+    """Fetch the raw MARCXML for a single record in a batch, returning it
+    with whether it was read from the cache. An error block is returned in
+    place of the record if it could not be retrieved"""
+    marcData = getCachedMARCXML(identifier)
+    if marcData is not None:
+        return marcData, True
+
+    try:
+        return fetchMARCXML(identifier), False
+    except OCLCError as err:
+        logger.error('OCLC Query failed with message: %s', err.message)
+        return {'status': 500, 'data': {'message': err.message}}, False
+    except Exception as err:
+        logger.error('Unexpected error fetching record %s', identifier)
+        logger.debug(err)
+        return {'status': 500, 'data': {'message': str(err)}}, False
@@ -0,0 +1,111 @@
+import json
+import os
+
+from helpers.importHelpers import optionalImport
+from helpers.logHelpers import createLog
+from lib.dataModel import (
+    DataObject, SlottedDataObject, WorkRecord, InstanceRecord, Format, Agent,
+    Identifier, Link, Subject, Measurement, Date
+)
+
+orjson = optionalImport('orjson')
+
+logger = createLog('serializer')
+
+JSON_FORMATS = ('default', 'compact')
+
+
+def createSerializer(modelClass):
+    """Return a function returning the dict written to JSON for a data model
+    class. Objects of the default data model already store this dict, which
+    is returned by vars. For the slotted data model a function is generated
+    for each class, which builds the dict from a literal of its fields, in
+    order, rather than reading them by name at runtime. Any extras are added
+    after the fields, as in getDictValue"""
+    if not issubclass(modelClass, SlottedDataObject):
+        return vars
+
+    fieldItems = ', '.join(
+        '{0!r}: obj.{0}'.format(field) for field in modelClass.FIELDS
+    )
+    source = (
+        'def serialize{name}(obj):\n'
+        '    record = {{{fields}}}\n'
+        '    if obj._extras:\n'
+        '        record.update(obj._extras)\n'
+        '    return record\n'
+    ).format(name=modelClass.__name__, fields=fieldItems)
+
+    namespace = {}
+    exec(source, namespace)
+    return namespace['serialize{}'.format(modelClass.__name__)]
+
+
+# Serializers for each data model class, returning the dict written to JSON
+SERIALIZERS = {
+    modelClass: createSerializer(modelClass)
+    for modelClass in [
+        WorkRecord, InstanceRecord, Format, Agent, Identifier, Link,
+        Subject, Measurement, Date
+    ]
+}
+
+
+def serializeObject(obj):
+    """Return the dict representation of an object that json can't encode.
+    Data model classes are looked up directly by class, any other object
+    falls back to its attributes"""
+    try:
+        return SERIALIZERS[type(obj)](obj)
+    except KeyError:
+        if isinstance(obj, DataObject):
+            return obj.getDictValue()
+        return vars(obj)
+
+
+# Encoders are shared rather than created on each call to json.dumps
+JSON_ENCODER = json.JSONEncoder(ensure_ascii=False, default=serializeObject)
+COMPACT_ENCODER = json.JSONEncoder(
+    ensure_ascii=False, separators=(',', ':'), default=serializeObject
+)
+
+
+def getFormat():
+    """The format of the JSON written for records. The default format is
+    byte-identical to earlier releases. The compact format omits the
+    whitespace between items, and is written by orjson if it is installed,
+    which is considerably faster"""
+    jsonFormat = os.environ.get('JSON_FORMAT', 'default')
+    if jsonFormat not in JSON_FORMATS:
+        logger.warning('Unknown JSON_FORMAT %s, using default', jsonFormat)
+        return 'default'
+
+    return jsonFormat
+
+
+def toJSONStdlib(obj):
+    return JSON_ENCODER.encode(obj)
+
+
+def toJSONCompactStdlib(obj):
+    return COMPACT_ENCODER.encode(obj)
+
+
+def toJSONOrjson(obj):
+    """Write compact JSON with orjson. This is byte-identical to the output
+    of toJSONCompactStdlib, other than for floats that are not finite or are
+    large or small enough to be written with an exponent, which the data
+    model does not contain"""
+    return orjson.dumps(
+        obj, default=serializeObject, option=orjson.OPT_NON_STR_KEYS
+    ).decode('utf-8')
+
+
+def getSerializer():
+    if getFormat() == 'compact':
+        return toJSONOrjson if orjson is not None else toJSONCompactStdlib
+
+    return toJSONStdlib
+
+
+toJSON = getSerializer()
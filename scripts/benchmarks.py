@@ -0,0 +1,425 @@
+import json
+import logging
+import os
+import re
+import subprocess
+import sys
+import time
+import timeit
+
+from helpers.logHelpers import createLog
+from helpers.errorHelpers import InvalidExecutionType
+
+logger = createLog('benchmarks')
+
+# This script is invoked by the Makefile in root to time performance
+# sensitive parts of the lookup pipeline against their previous
+# implementations. Run with `make benchmark BENCH=[name]`
+
+
+def legacyClassifyURI(uri, ebookRegexes, idRegexes):
+    """URI classification as performed before precompiled patterns, searching
+    each regex string in turn"""
+    re.search(r'\/((?:(?!\/)[^.])+(?=$|\.[a-z]{3,4}$))', uri)
+
+    for source, regex in ebookRegexes.items():
+        if re.search(regex, uri):
+            return source, 'ebook'
+
+    for idType, regex in idRegexes.items():
+        idGroup = re.search(regex, uri)
+        if idGroup is not None:
+            return idType, 'identifier'
+
+    return 'unknown', 'link'
+
+
+def benchClassifier(number=20):
+    """Time classification of the 856 URIs of a large serial record, with
+    many distinct links, for both the legacy and compiled classifiers"""
+    from lib.parsers.parse856Holding import HoldingParser
+
+    uris = []
+    for i in range(250):
+        uris.extend([
+            'http://www.gutenberg.org/ebooks/{}.epub.images'.format(i),
+            'https://archive.org/details/serial{}'.format(i),
+            'https://catalog.hathitrust.org/api/volumes/oclc/{}.html'.format(i),
+            'http://worldcat.org/oclc/{}'.format(i),
+            'http://www.example.org/holdings/vol{}.pdf'.format(i)
+        ])
+
+    def runLegacy():
+        for uri in uris:
+            legacyClassifyURI(
+                uri, HoldingParser.EBOOK_REGEX, HoldingParser.ID_REGEX
+            )
+
+    def runCompiled():
+        HoldingParser.classifyURI.cache_clear()
+        HoldingParser.identifyURI.cache_clear()
+        for uri in uris:
+            HoldingParser.classifyURI(uri)
+
+    def runCached():
+        for uri in uris:
+            HoldingParser.classifyURI(uri)
+
+    return {
+        'legacy': timeit.timeit(runLegacy, number=number),
+        'compiled': timeit.timeit(runCompiled, number=number),
+        'compiled (cached)': timeit.timeit(runCached, number=number)
+    }
+
+
+def createBenchRecord(number, fieldCount=40):
+    """Build a raw MARCXML record with a range of fields read by
+    readFromMARC, excluding any that would make network requests"""
+    datafields = ''.join(
+        '<datafield tag="{}" ind1="0" ind2="0">'
+        '<subfield code="a">Value {}</subfield>'
+        '<subfield code="x">Subdivision</subfield>'
+        '<subfield code="z">Place</subfield>'
+        '</datafield>'.format(tag, i)
+        for i in range(fieldCount)
+        for tag in ['020', '246', '300', '650']
+    )
+    return (
+        '<record><leader>00000cam a2200000 a 4500</leader>'
+        '<controlfield tag="001">{}</controlfield>'
+        '<controlfield tag="008">850101s1923    nyu           000 0 eng d'
+        '</controlfield>'
+        '<datafield tag="245" ind1="1" ind2="0">'
+        '<subfield code="a">Title</subfield></datafield>{}</record>'
+    ).format(number, datafields).encode('utf-8')
+
+
+def benchParsing(recordCount=1000):
+    """Time parsing a set of raw records in the current process and with
+    a ParsePool of each size from one process up to the number of cores"""
+    from lib.parsePool import ParsePool, parseRawRecord
+
+    records = [createBenchRecord(i) for i in range(recordCount)]
+
+    results = {}
+    startTime = time.perf_counter()
+    for record in records:
+        parseRawRecord(record)
+    results['in process'] = time.perf_counter() - startTime
+
+    for processes in range(1, (os.cpu_count() or 1) + 1):
+        with ParsePool(processes) as pool:
+            startTime = time.perf_counter()
+            for _ in pool.parse(records):
+                pass
+            results['{} processes'.format(processes)] = (
+                time.perf_counter() - startTime
+            )
+
+    return results
+
+
+def createBenchInstance(formatCount=300):
+    """Build an InstanceRecord with many formats, as created for large
+    serials held by HathiTrust"""
+    from lib.dataModel import InstanceRecord, Link, Identifier, Agent, Date
+
+    instance = InstanceRecord(title='Bench Title', language='eng')
+    for i in range(formatCount):
+        instance.addFormat(**{
+            'source': 'hathitrust',
+            'content_type': 'ebook',
+            'links': [
+                Link(
+                    url='babel.hathitrust.org/cgi/pt?id=bench.{}'.format(i),
+                    mediaType='text/html',
+                    flags={
+                        'local': False, 'download': False,
+                        'images': True, 'ebook': False
+                    }
+                ),
+                Link(
+                    url='babel.hathitrust.org/cgi/imgsrv/download/pdf?id=bench.{}'.format(i),  # noqa: E501
+                    mediaType='application/pdf',
+                    flags={
+                        'local': False, 'download': True,
+                        'images': True, 'ebook': False
+                    }
+                )
+            ],
+            'identifiers': [
+                Identifier(identifier='bench.{}'.format(i), source='hathi')
+            ]
+        })
+        instance.addIdentifier(type='oclc', identifier=str(i), weight=0.8)
+    instance.agents = [Agent(name='Agent {}'.format(i)) for i in range(20)]
+    instance.dates = [Date(displayDate='1900', dateType='pub_date')]
+
+    return {'type': 'instance', 'method': 'update', 'data': instance}
+
+
+def benchSerialization(number=100):
+    """Time serializing a record with hundreds of formats with a json.dumps
+    callback, as used before lib.serializer, and with the serializer for
+    each JSON format"""
+    from lib import serializer
+
+    outputObject = createBenchInstance()
+
+    def runLegacy():
+        json.dumps(
+            outputObject, ensure_ascii=False,
+            default=lambda x: x.getDictValue()
+        )
+
+    results = {
+        'legacy': timeit.timeit(runLegacy, number=number),
+        'default': timeit.timeit(
+            lambda: serializer.toJSONStdlib(outputObject), number=number
+        ),
+        'compact (json)': timeit.timeit(
+            lambda: serializer.toJSONCompactStdlib(outputObject),
+            number=number
+        )
+    }
+    if serializer.orjson is not None:
+        results['compact (orjson)'] = timeit.timeit(
+            lambda: serializer.toJSONOrjson(outputObject), number=number
+        )
+
+    return results
+
+
+def measureDataModel(count=100000, number=20):
+    """Measure the data model selected by DATA_MODEL in this interpreter.
+    Returns the bytes allocated for each Identifier and Link pair, as parsed
+    from the 856 fields of a bulk run, and the time taken to serialize a
+    record with hundreds of formats"""
+    import tracemalloc
+    from lib.dataModel import Identifier, Link
+    from lib.serializer import toJSON
+
+    # Values are created beforehand so that only the objects are measured
+    values = [
+        (
+            'bench.{}'.format(i),
+            'babel.hathitrust.org/cgi/pt?id=bench.{}'.format(i)
+        )
+        for i in range(count)
+    ]
+
+    tracemalloc.start()
+    pairs = [
+        (
+            Identifier(source='hathi', identifier=identifier),
+            Link(url=url, mediaType='text/html')
+        )
+        for identifier, url in values
+    ]
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del pairs
+
+    outputObject = createBenchInstance()
+    return {
+        'bytes': size // count,
+        'serialization': timeit.timeit(
+            lambda: toJSON(outputObject), number=number
+        )
+    }
+
+
+def benchDataModel():
+    """Compare memory use and serialization time of the default and slotted
+    data models, each measured in a new interpreter as the data model is
+    selected when lib.dataModel is imported"""
+    results = {}
+    for model in ['dict', 'slotted']:
+        measureRun = subprocess.run(
+            [
+                sys.executable, '-c',
+                'import json\n'
+                'from scripts.benchmarks import measureDataModel\n'
+                'print(json.dumps(measureDataModel()))\n'
+            ],
+            stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+            universal_newlines=True, check=True,
+            env=dict(os.environ, DATA_MODEL=model)
+        )
+        measures = json.loads(measureRun.stdout)
+        results['{} bytes per pair'.format(model)] = measures['bytes']
+        results['{} serialization'.format(model)] = measures['serialization']
+
+    return results
+
+
+def benchAgentMerge(agentCount=500, number=1):
+    """Time merging two lists of agents with few matches between them, such
+    as the contributors to a set of conference proceedings, comparing every
+    pair of names and comparing only names that share a blocking key"""
+    from lib.dataModel import Agent
+    from unittest.mock import patch
+
+    surnames = [
+        'Smith', 'Garcia', 'Nguyen', 'Okafor', 'Tanaka', 'Kowalski', 'Dubois',
+        'Rossi', 'Ivanova', 'Haddad', 'Murphy', 'Silva', 'Jensen', 'Kim',
+        'Bauer', 'Novak', 'Cohen', 'Singh', 'Moreau', 'Lindqvist'
+    ]
+    givenNames = [
+        'Ada', 'Bruno', 'Chen', 'Dara', 'Emil', 'Farah', 'Goran', 'Hana',
+        'Ines', 'Jonas', 'Kofi', 'Lena', 'Mateo', 'Nadia', 'Oskar', 'Priya',
+        'Quinn', 'Rosa', 'Sven', 'Tomas', 'Umar', 'Vera', 'Wen', 'Yusuf',
+        'Zora'
+    ]
+    names = [
+        '{}, {}'.format(surname, given)
+        for given in givenNames for surname in surnames
+    ][:agentCount * 2]
+    newNames, names = names[::2], names[1::2]
+
+    def runMerge():
+        Agent.checkForMatches(
+            [Agent(name, 'author') for name in newNames],
+            [Agent(name, 'editor') for name in names]
+        )
+
+    results = {}
+    for label, pairs in [('all pairs', float('inf')), ('blocked', 0)]:
+        with patch('lib.dataModel.AGENT_BLOCKING_PAIRS', pairs):
+            results[label] = timeit.timeit(runMerge, number=number)
+
+    return results
+
+
+def benchSimilarity(nameCount=1000, number=1):
+    """Time scoring every pair of names from two lists with a jaro_winkler
+    call per pair and with the batch Agent.scoreNames"""
+    from Levenshtein import jaro_winkler
+    from lib.dataModel import Agent
+
+    names = ['Author {}, {}'.format(i, i * 7) for i in range(nameCount)]
+    agents = [Agent('Writer {}, {}'.format(i, i * 3)) for i in range(nameCount)]
+
+    def runPairs():
+        agentNames = [agent['name'].lower() for agent in agents]
+        for name in names:
+            name = name.lower()
+            [jaro_winkler(agentName, name) for agentName in agentNames]
+
+    return {
+        'per pair': timeit.timeit(runPairs, number=number),
+        'batch': timeit.timeit(
+            lambda: Agent.scoreNames(names, agents), number=number
+        )
+    }
+
+
+IMPORT_TIMER = (
+    'import time\n'
+    'startTime = time.perf_counter()\n'
+    'import service\n'
+    '{}'
+    'print(time.perf_counter() - startTime)\n'
+)
+
+
+def benchImports(number=5):
+    """Time a cold start of the function in a new interpreter, importing
+    service alone, as for API requests, and also creating the Kinesis client
+    used when writing results. Returns the mean of each"""
+    timers = {
+        'import service': IMPORT_TIMER.format(''),
+        'import and kinesis client': IMPORT_TIMER.format(
+            'from lib.outPutManager import OutputManager\n'
+            'OutputManager.KINESIS_CLIENT\n'
+        )
+    }
+
+    results = {}
+    for label, timer in timers.items():
+        total = 0
+        for _ in range(number):
+            timerRun = subprocess.run(
+                [sys.executable, '-c', timer],
+                stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+                universal_newlines=True, check=True
+            )
+            total += float(timerRun.stdout.strip())
+        results[label] = total / number
+
+    return results
+
+
+def profileImports(moduleName='service'):
+    """Import a module in a new interpreter with -X importtime, returning a
+    dict of the cumulative import time in seconds of each module imported"""
+    profileRun = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', 'import {}'.format(
+            moduleName
+        )],
+        stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+        universal_newlines=True, check=True
+    )
+
+    importTimes = {}
+    for line in profileRun.stderr.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        try:
+            _, cumulative, module = line[12:].split('|')
+            importTimes[module.strip()] = int(cumulative) / 1000000
+        except ValueError:
+            # Skips the header line
+            continue
+
+    return importTimes
+
+
+def benchImportProfile(count=15):
+    """List the modules that take longest to import, including the modules
+    they import, when service is imported"""
+    importTimes = profileImports('service')
+    return dict(
+        sorted(importTimes.items(), key=lambda x: x[1], reverse=True)[:count]
+    )
+
+
+BENCHMARKS = {
+    'classifier': benchClassifier,
+    'parsing': benchParsing,
+    'serialization': benchSerialization,
+    'datamodel': benchDataModel,
+    'agents': benchAgentMerge,
+    'similarity': benchSimilarity,
+    'imports': benchImports,
+    'importprofile': benchImportProfile
+}
+
+
+def main():
+
+    if len(sys.argv) != 2:
+        logger.warning('This script takes one, and only one, argument!')
+        sys.exit(1)
+    benchName = sys.argv[1]
+
+    if benchName not in BENCHMARKS:
+        logger.error('Benchmark not recognized! %s', benchName)
+        raise InvalidExecutionType('{} is not a valid benchmark'.format(
+            benchName
+        ))
+
+    # Parsing errors in benchmark records are expected and would be logged
+    # for every iteration
+    logging.disable(logging.CRITICAL)
+
+    # Results are times in seconds, or sizes in bytes given as integers
+    for label, result in BENCHMARKS[benchName]().items():
+        if isinstance(result, int):
+            print('{:<32}{:>12d}B'.format(label, result))
+        else:
+            print('{:<32}{:>12.4f}s'.format(label, result))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,29 @@
+import sys
+
+from helpers.logHelpers import createLog
+from lib.bulkIngest import ingestMARC
+
+logger = createLog('bulkIngest')
+
+# This script is invoked by the Makefile in root to parse MARCXML dumps on
+# disk into InstanceRecord JSON lines, without fetching records from OCLC.
+# Run with `make bulk-ingest INPUT=[file or directory] OUTPUT=[file]`, if no
+# OUTPUT is given the records are written to stdout
+
+
+def main():
+
+    if len(sys.argv) not in [2, 3]:
+        logger.warning('This script takes an input path and an output file')
+        sys.exit(1)
+    inputPath = sys.argv[1]
+
+    if len(sys.argv) == 3 and sys.argv[2] != '':
+        with open(sys.argv[2], 'w') as outFile:
+            ingestMARC(inputPath, outFile)
+    else:
+        ingestMARC(inputPath, sys.stdout)
+
+
+if __name__ == '__main__':
+    main()
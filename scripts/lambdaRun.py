@@ -31,7 +31,7 @@ def main():
     runType = sys.argv[1]
 
     if re.match(r'^(?:development|qa|production)', runType):
-        logger.info('Deploying lambda to {} environment'.format(runType))
+        logger.info('Deploying lambda to %s environment', runType)
         setEnvVars(runType)
         subprocess.run([
             'lambda',
@@ -59,7 +59,9 @@ def main():
 
     elif re.match(r'^build-(?:development|qa|production)', runType):
         env = runType.replace('build-', '')
-        logger.info('Building package for {} environment, will be in dist/'.format(env))  # noqa: E501
+        logger.info(
+            'Building package for %s environment, will be in dist/', env
+        )
         setEnvVars(env)
         subprocess.run([
             'lambda',
@@ -72,7 +74,7 @@ def main():
         os.remove('run_config.yaml')
 
     else:
-        logger.error('Execution type not recognized! {}'.format(runType))
+        logger.error('Execution type not recognized! %s', runType)
         raise InvalidExecutionType('{} is not a valid command'.format(runType))
 
 
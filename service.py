@@ -1,7 +1,13 @@
+from concurrent.futures import ThreadPoolExecutor
+import json
+import os
+
+from helpers.errorHelpers import KinesisError
 from helpers.logHelpers import createLog
+from helpers.metricsHelpers import trackRequest, propagateMetrics
 
 from lib.outPutManager import OutputManager
-from lib.recordFetch import fetchData
+from lib.recordFetch import fetchData, fetchBatch
 
 # Logger can be passed name of current module
 # Can also be instantiated on a class/method basis using dot notation
@@ -10,8 +16,29 @@ logger = createLog('handler')
 
 def handler(event, context):
     """Method invoked by Lambda event. Verifies that records were received and,
-    if so, passes them to be parsed"""
+    if so, passes them to be parsed. The time spent in each stage of the
+    lookup is recorded and logged once the event has been handled"""
     logger.debug('Starting Lambda Execution')
+
+    with trackRequest(getEventType(event)):
+        return handleEvent(event)
+
+
+def getEventType(event):
+    if event.get('Records') is not None:
+        return 'sqs'
+    elif event.get('body') is not None:
+        return 'batch'
+    return 'lookup'
+
+
+def handleEvent(event):
+    if event.get('Records') is not None:
+        return parseSQSBatch(event['Records'])
+
+    if event.get('body') is not None:
+        return parseBatch(event['body'])
+
     try:
         queryIdentifier = event['queryStringParameters']['identifier']
         queryType = event['queryStringParameters']['type']
@@ -32,4 +59,99 @@ def handler(event, context):
         return OutputManager.formatResponse(
             500,
             {'message': err.message}
-        )
\ No newline at end of file
+        )
+
+
+def parseBatch(body):
+    """Handles a batch lookup request, where the request body contains a list
+    of identifiers and their type. Each identifier receives its own status
+    code in the response so that individual failures do not fail the batch"""
+    logger.debug('Parsing batch lookup request')
+    try:
+        if isinstance(body, str):
+            body = json.loads(body)
+        queryIdentifiers = body['identifiers']
+        queryType = body['type']
+    except (ValueError, TypeError, KeyError):
+        return OutputManager.formatResponse(
+            400,
+            {'message': 'Batch request body must include identifiers and type'}
+        )
+
+    if not isinstance(queryIdentifiers, list) or len(queryIdentifiers) < 1:
+        return OutputManager.formatResponse(
+            400,
+            {'message': 'Batch identifiers must be a non-empty list'}
+        )
+
+    # Identifiers key the response, so must be strings or numbers. Numbers
+    # are converted so that 1 and "1" are treated as the same identifier
+    if not all(
+        isinstance(iden, (str, int)) and not isinstance(iden, bool)
+        for iden in queryIdentifiers
+    ):
+        return OutputManager.formatResponse(
+            400,
+            {'message': 'Batch identifiers must be strings or numbers'}
+        )
+
+    return OutputManager.formatResponse(
+        200,
+        fetchBatch([str(iden) for iden in queryIdentifiers], queryType)
+    )
+
+
+def parseSQSBatch(records):
+    """Handles a batch of messages received from an SQS queue, each containing
+    an identifier and type. Messages are processed concurrently and the
+    results written to the output stream in batches. The IDs of any messages
+    that fail are returned as batchItemFailures, so that only those messages
+    are returned to the queue to be retried"""
+    logger.info('Processing batch of %s SQS messages', len(records))
+    workers = int(os.environ.get('BATCH_WORKERS', 10))
+
+    with ThreadPoolExecutor(max_workers=max(workers, 1)) as executor:
+        results = list(executor.map(
+            propagateMetrics(processSQSMessage), records
+        ))
+
+    failedIDs = []
+    with OutputManager.createBuffer(os.environ['OUTPUT_KINESIS']) as buffer:
+        for record, result in zip(records, results):
+            if result is None:
+                failedIDs.append(record.get('messageId'))
+                continue
+
+            identifier, instance = result
+            try:
+                buffer.add(
+                    {'type': 'instance', 'method': 'update', 'data': instance},
+                    str(identifier),
+                    tag=record.get('messageId')
+                )
+            except KinesisError:
+                failedIDs.append(record.get('messageId'))
+
+    failedIDs.extend(buffer.failed)
+
+    return {
+        'batchItemFailures': [
+            {'itemIdentifier': messageID}
+            for messageID in failedIDs
+        ]
+    }
+
+
+def processSQSMessage(record):
+    """Fetch the record requested by a single SQS message. Returns the
+    identifier and fetched record, or None if the message failed"""
+    try:
+        message = json.loads(record['body'])
+        identifier = message['identifier']
+        return identifier, fetchData(identifier, message['type'])
+    except Exception as err:
+        logger.error(
+            'Failed to process SQS message %s', record.get('messageId', None)
+        )
+        logger.debug(err)
+        return None
@@ -0,0 +1,87 @@
+from io import StringIO
+import json
+import os
+import tempfile
+import unittest
+
+from lib.bulkIngest import ingestMARC, findMARCFiles, iterRawRecords
+
+TEST_RECORD = (
+    '<record>'
+    '<leader>00000cam a2200000 a 4500</leader>'
+    '<controlfield tag="001">{}</controlfield>'
+    '<controlfield tag="008">850101s1923    nyu           000 0 eng d'
+    '</controlfield>'
+    '<datafield tag="245" ind1="1" ind2="0">'
+    '<subfield code="a">Test Title {}</subfield>'
+    '</datafield>'
+    '</record>'
+)
+
+
+def createCollection(oclcNumbers):
+    return (
+        '<collection xmlns="http://www.loc.gov/MARC21/slim">{}</collection>'
+    ).format(''.join(TEST_RECORD.format(n, n) for n in oclcNumbers))
+
+
+class TestBulkIngest(unittest.TestCase):
+    def setUp(self):
+        self.tmpDir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmpDir.cleanup()
+
+    def writeFile(self, fileName, content):
+        filePath = os.path.join(self.tmpDir.name, fileName)
+        with open(filePath, 'w') as outFile:
+            outFile.write(content)
+        return filePath
+
+    def test_findMARCFiles_directory(self):
+        self.writeFile('b.xml', '')
+        self.writeFile('a.xml', '')
+        self.writeFile('notes.txt', '')
+        files = findMARCFiles(self.tmpDir.name)
+        self.assertEqual(
+            [os.path.basename(f) for f in files], ['a.xml', 'b.xml']
+        )
+
+    def test_findMARCFiles_single_file(self):
+        filePath = self.writeFile('a.xml', '')
+        self.assertEqual(findMARCFiles(filePath), [filePath])
+
+    def test_iterRawRecords(self):
+        filePath = self.writeFile('a.xml', createCollection(['1', '2']))
+        records = list(iterRawRecords(filePath))
+        self.assertEqual(len(records), 2)
+        self.assertIn(b'<controlfield tag="001">2</controlfield>', records[1])
+
+    def test_ingestMARC(self):
+        self.writeFile('a.xml', createCollection(['1', '2']))
+        self.writeFile('b.xml', createCollection(['3']))
+        outStream = StringIO()
+        written = ingestMARC(self.tmpDir.name, outStream, processes=2)
+        self.assertEqual(written, 3)
+        titles = [
+            json.loads(line)['title']
+            for line in outStream.getvalue().splitlines()
+        ]
+        self.assertEqual(
+            titles, ['Test Title 1', 'Test Title 2', 'Test Title 3']
+        )
+
+    def test_ingestMARC_unordered(self):
+        self.writeFile('a.xml', createCollection(['1', '2', '3']))
+        outStream = StringIO()
+        written = ingestMARC(
+            self.tmpDir.name, outStream, processes=2, ordered=False
+        )
+        self.assertEqual(written, 3)
+        titles = {
+            json.loads(line)['title']
+            for line in outStream.getvalue().splitlines()
+        }
+        self.assertEqual(
+            titles, {'Test Title 1', 'Test Title 2', 'Test Title 3'}
+        )
@@ -0,0 +1,115 @@
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from helpers.cacheHelpers import LRUCache, SQLiteCache, TieredCache, createCache
+
+
+class TestLRUCache(unittest.TestCase):
+    def test_get_set(self):
+        cache = LRUCache(maxSize=2)
+        cache.set('a', 1)
+        self.assertEqual(cache.get('a'), 1)
+        self.assertEqual(cache.get('b'), None)
+        self.assertEqual(cache.stats()['hits'], 1)
+        self.assertEqual(cache.stats()['misses'], 1)
+
+    def test_lru_eviction(self):
+        cache = LRUCache(maxSize=2)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        cache.get('a')
+        cache.set('c', 3)
+        self.assertEqual(cache.get('b'), None)
+        self.assertEqual(cache.get('a'), 1)
+        self.assertEqual(cache.stats()['evictions'], 1)
+
+    @patch('helpers.cacheHelpers.time.time')
+    def test_ttl_expiry(self, mockTime):
+        mockTime.return_value = 100
+        cache = LRUCache(maxSize=2, ttl=10)
+        cache.set('a', 1)
+        cache.set('b', 2, ttl=60)
+        mockTime.return_value = 120
+        self.assertEqual(cache.get('a', 'missing'), 'missing')
+        self.assertEqual(cache.get('b'), 2)
+        self.assertEqual(len(cache), 1)
+
+
+class TestSQLiteCache(unittest.TestCase):
+    def setUp(self):
+        self.tmpDir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmpDir.name, 'cache.db')
+
+    def tearDown(self):
+        self.tmpDir.cleanup()
+
+    def test_get_set(self):
+        cache = SQLiteCache(self.path)
+        cache.set('a', '<record/>')
+        self.assertEqual(cache.get('a'), '<record/>')
+        self.assertEqual(cache.get('b'), None)
+
+    def test_persists_between_instances(self):
+        SQLiteCache(self.path).set('a', '<record/>')
+        self.assertEqual(SQLiteCache(self.path).get('a'), '<record/>')
+
+    def test_size_eviction(self):
+        cache = SQLiteCache(self.path, maxSize=2)
+        with patch('helpers.cacheHelpers.time.time', side_effect=[1, 2, 3, 4]):
+            cache.set('a', '1')
+            cache.set('b', '2')
+            cache.get('a')
+            cache.set('c', '3')
+        self.assertEqual(len(cache), 2)
+        self.assertEqual(cache.get('b'), None)
+        self.assertEqual(cache.stats()['evictions'], 1)
+
+    @patch('helpers.cacheHelpers.time.time')
+    def test_ttl_expiry(self, mockTime):
+        mockTime.return_value = 100
+        cache = SQLiteCache(self.path, ttl=10)
+        cache.set('a', '1')
+        mockTime.return_value = 120
+        self.assertEqual(cache.get('a'), None)
+        self.assertEqual(len(cache), 0)
+
+
+class TestTieredCache(unittest.TestCase):
+    def test_promotes_from_disk(self):
+        with tempfile.TemporaryDirectory() as tmpDir:
+            disk = SQLiteCache(os.path.join(tmpDir, 'cache.db'))
+            disk.set('a', '1')
+            cache = TieredCache(LRUCache(), disk)
+            self.assertEqual(cache.get('a'), '1')
+            self.assertEqual(cache.memory.get('a'), '1')
+            self.assertEqual(cache.get('b', 'missing'), 'missing')
+
+    @patch('helpers.cacheHelpers.time.time')
+    def test_promotion_keeps_expiry(self, mockTime):
+        mockTime.return_value = 100
+        with tempfile.TemporaryDirectory() as tmpDir:
+            disk = SQLiteCache(os.path.join(tmpDir, 'cache.db'), ttl=60)
+            disk.set('a', '1')
+            cache = TieredCache(LRUCache(ttl=60), disk)
+            mockTime.return_value = 150
+            self.assertEqual(cache.get('a'), '1')
+            mockTime.return_value = 170
+            self.assertEqual(cache.memory.get('a', 'missing'), 'missing')
+
+    def test_create_memory_only(self):
+        with patch.dict('os.environ', {'TEST_CACHE_SIZE': '5'}):
+            cache = createCache('TEST_CACHE', ttl=30)
+        self.assertEqual(cache.memory.maxSize, 5)
+        self.assertEqual(cache.memory.ttl, 30)
+        self.assertIsNone(cache.disk)
+
+    def test_create_with_disk(self):
+        with tempfile.TemporaryDirectory() as tmpDir:
+            path = os.path.join(tmpDir, 'cache.db')
+            with patch.dict('os.environ', {'TEST_CACHE_PATH': path}):
+                cache = createCache('TEST_CACHE')
+            self.assertIsInstance(cache.disk, SQLiteCache)
+            cache.set('a', '1')
+            self.assertIn('disk', cache.stats())
@@ -0,0 +1,90 @@
+from io import BytesIO
+import unittest
+from unittest.mock import patch
+
+from lib.readers.compactMARC import (
+    parseCompactMARC, iterCompactRecords, CompactField, CompactSubfield
+)
+from lib.readers.oclcLookup import parseMARC
+from helpers.errorHelpers import OCLCError
+
+TEST_RECORD = (
+    '<record xmlns="http://www.loc.gov/MARC21/slim">'
+    '<leader>00000cam a2200000 a 4500</leader>'
+    '<controlfield tag="001">12345</controlfield>'
+    '<datafield tag="245" ind1="1" ind2="0">'
+    '<subfield code="a">Test Title</subfield>'
+    '<subfield code="b">Sub Title</subfield>'
+    '<subfield code="c"></subfield>'
+    '</datafield>'
+    '<datafield tag="700" ind1="1" ind2=" ">'
+    '<subfield code="a">Skipped, Field</subfield>'
+    '</datafield>'
+    '<datafield tag="856" ind1="4" ind2=" ">'
+    '<subfield code="u">http://test.org/1</subfield>'
+    '</datafield>'
+    '</record>'
+)
+
+
+class TestCompactMARC(unittest.TestCase):
+    def test_parse_all_fields(self):
+        record = parseCompactMARC(TEST_RECORD)
+        self.assertEqual(record.leader, '00000cam a2200000 a 4500')
+        self.assertEqual(
+            [f.tag for f in record.fields], ['001', '245', '700', '856']
+        )
+        self.assertEqual(record['001'][0].value, '12345')
+
+    def test_parse_selected_tags(self):
+        record = parseCompactMARC(TEST_RECORD, ['001', '245'])
+        self.assertEqual([f.tag for f in record.fields], ['001', '245'])
+        self.assertEqual(record['700'], [])
+
+    def test_datafield_matches_marcalyx(self):
+        compactField = parseCompactMARC(TEST_RECORD)['245'][0]
+        marcalyxField = parseMARC(TEST_RECORD)['245'][0]
+        self.assertEqual(compactField.ind1, marcalyxField.ind1)
+        self.assertEqual(compactField.ind2, marcalyxField.ind2)
+        self.assertEqual(compactField.value, marcalyxField.value)
+        self.assertEqual(
+            compactField.subfield('b')[0].value,
+            marcalyxField.subfield('b')[0].value
+        )
+        self.assertEqual(compactField.subfield('c'), [])
+        self.assertEqual(repr(compactField), repr(marcalyxField))
+
+    def test_iterate_collection(self):
+        collection = (
+            '<collection xmlns="http://www.loc.gov/MARC21/slim">'
+            '{0}{0}</collection>'
+        ).format(TEST_RECORD.replace(
+            ' xmlns="http://www.loc.gov/MARC21/slim"', ''
+        ))
+        records = list(iterCompactRecords(
+            BytesIO(collection.encode('utf-8')), ['001']
+        ))
+        self.assertEqual(len(records), 2)
+        for record in records:
+            self.assertEqual(record['001'][0].value, '12345')
+
+    def test_parse_invalid_xml(self):
+        with self.assertRaises(OCLCError):
+            parseCompactMARC('<record><controlfield></record>')
+
+    def test_parse_missing_record(self):
+        with self.assertRaises(OCLCError):
+            parseCompactMARC('<collection></collection>')
+
+    @patch.dict('os.environ', {'MARC_PARSER': 'compact'})
+    def test_parseMARC_compact_mode(self):
+        record = parseMARC(TEST_RECORD)
+        self.assertEqual([f.tag for f in record.fields], ['001', '245', '856'])
+
+    def test_field_repr(self):
+        field = CompactField(
+            '856', ind1='4', ind2=' ',
+            subfields=[CompactSubfield('u', 'http://test.org')]
+        )
+        self.assertEqual(repr(field), '856 4#$uhttp://test.org')
+        self.assertEqual(repr(CompactField('001', value='1')), '001   1')
@@ -1,7 +1,62 @@
+from Levenshtein import jaro_winkler
+import pickle
 import unittest
 from unittest.mock import patch, mock_open, call
 
-from lib.dataModel import DataObject, WorkRecord, Format, Link, Agent, Measurement
+from lib.dataModel import (
+    DataObject, SlottedDataObject, WorkRecord, InstanceRecord, Format, Link,
+    Agent, Measurement, Identifier, Date, IndexedList, identifierKey, dateKey,
+    AgentMatcher
+)
+
+
+class SlottedRecord(SlottedDataObject):
+    __slots__ = ('type', 'identifier', 'weight')
+
+    def __init__(self, source=None, identifier=None):
+        super().__init__()
+        self.type = source
+        self.identifier = identifier
+        self.weight = None
+
+
+class SlottedDataModel(unittest.TestCase):
+    def test_slotted_set(self):
+        record = SlottedRecord(source='oclc', identifier='1')
+        record['weight'] = 0.8
+        record['source'] = 'test'
+        self.assertFalse(hasattr(record, '__dict__'))
+        self.assertEqual(record.weight, 0.8)
+        self.assertEqual(record.source, 'test')
+        self.assertEqual(record.extras, {'source': 'test'})
+        self.assertEqual(record.getDictValue(), {
+            'type': 'oclc', 'identifier': '1', 'weight': 0.8, 'source': 'test'
+        })
+
+    def test_slotted_set_attribute(self):
+        record = SlottedRecord()
+        with self.assertRaises(AttributeError):
+            record.test = 'test1'
+
+    def test_slotted_get_missing(self):
+        record = SlottedRecord()
+        with self.assertRaises(KeyError):
+            record['test']
+        with self.assertRaises(AttributeError):
+            record.test
+
+    def test_slotted_createFromDict(self):
+        record = SlottedRecord.createFromDict(**{'type': 'oclc', 'test': 1})
+        self.assertIsInstance(record, SlottedRecord)
+        self.assertEqual(record.type, 'oclc')
+        self.assertEqual(record.extras, {'test': 1})
+
+    def test_slotted_pickle(self):
+        record = SlottedRecord(source='oclc', identifier='1')
+        record['source'] = 'test'
+        unpickled = pickle.loads(pickle.dumps(record))
+        self.assertEqual(unpickled.getDictValue(), record.getDictValue())
+
 
 class DataModel(unittest.TestCase):
 
@@ -98,3 +153,127 @@ class DataModel(unittest.TestCase):
         measure = Measurement('test', 2, 1, 'now')
         value = Measurement.getValueForMeasurement([measure], 'test')
         self.assertEqual(value, 2)
+
+    def test_indexedList_lookup(self):
+        dates = IndexedList(dateKey)
+        first = Date(displayDate='1900', dateType='pub_date')
+        second = Date(displayDate='1901', dateType='pub_date')
+        dates.extend([first, second])
+        self.assertEqual(len(dates), 2)
+        self.assertIs(dates.get('pub_date'), first)
+        self.assertIsNone(dates.get('copyright_date'))
+
+    def test_indexedList_dedupe(self):
+        identifiers = IndexedList(identifierKey, dedupe=True)
+        identifiers.append(Identifier(source='isbn', identifier='1', weight=1))
+        identifiers.append(Identifier(source='isbn', identifier='1'))
+        identifiers.insert(0, Identifier(source='isbn', identifier='1'))
+        identifiers.append(Identifier(source='oclc', identifier='1'))
+        self.assertEqual(
+            [i.type for i in identifiers], ['isbn', 'oclc']
+        )
+        self.assertEqual(identifiers.get(('isbn', '1')).weight, 1)
+
+    def test_indexedList_reindex(self):
+        dates = IndexedList(dateKey)
+        first = Date(displayDate='1900', dateType='pub_date')
+        second = Date(displayDate='1901', dateType='pub_date')
+        dates.extend([first, second])
+        del dates[0]
+        self.assertIs(dates.get('pub_date'), second)
+        dates.clear()
+        self.assertIsNone(dates.get('pub_date'))
+
+    def test_indexedList_pickle(self):
+        dates = IndexedList(dateKey, [Date(dateType='pub_date')])
+        unpickled = pickle.loads(pickle.dumps(dates))
+        self.assertEqual(len(unpickled), 1)
+        self.assertEqual(unpickled.get('pub_date').date_type, 'pub_date')
+
+    @patch('lib.dataModel.DEDUPE_IDENTIFIERS', True)
+    def test_instance_identifier_dedupe(self):
+        instance = InstanceRecord()
+        instance.addIdentifier(type='isbn', identifier='1', weight=1)
+        instance.addIdentifier(type='isbn', identifier='1', weight=0.8)
+        self.assertEqual(len(instance.identifiers), 1)
+        self.assertEqual(instance.getIdentifier('isbn', '1').weight, 1)
+
+    def test_instance_identifier_no_dedupe(self):
+        instance = InstanceRecord()
+        instance.addIdentifier(type='isbn', identifier='1', weight=1)
+        instance.addIdentifier(type='isbn', identifier='1', weight=0.8)
+        self.assertEqual(len(instance.identifiers), 2)
+
+    @patch('lib.dataModel.DEDUPE_IDENTIFIERS', True)
+    def test_instance_createFromDict_indexed(self):
+        work = WorkRecord()
+        work.addInstance(
+            identifiers=[Identifier(source='isbn', identifier='1')],
+            dates=[Date(displayDate='1900', dateType='pub_date')]
+        )
+        instance = work.instances[0]
+        self.assertIsInstance(instance.identifiers, IndexedList)
+        self.assertEqual(instance.getDate('pub_date').display_date, '1900')
+        instance.addIdentifier(type='isbn', identifier='1')
+        self.assertEqual(len(instance.identifiers), 1)
+
+    def test_instance_assign_indexed(self):
+        instance = InstanceRecord()
+        instance.dates = [Date(displayDate='1900', dateType='pub_date')]
+        instance['identifiers'] = [Identifier(source='isbn', identifier='1')]
+        self.assertEqual(instance.getDate('pub_date').display_date, '1900')
+        self.assertIsNotNone(instance.getIdentifier('isbn', '1'))
+
+    @patch('lib.dataModel.AGENT_BLOCKING_PAIRS', 0)
+    def test_agent_merging_blocked(self):
+        new = [
+            Agent('Other, Agent', 'author'),
+            Agent('Test, Tester', 'tester', ['Bad, Tester'])
+        ]
+        existing = [Agent('Testing, Tester', 'user', ['Tester, Bad'])]
+        merged = list(Agent.checkForMatches(new, existing))
+        self.assertEqual(len(merged), 2)
+        self.assertEqual(merged[0].name, 'Test, Tester')
+        self.assertEqual(merged[0].roles, ['tester', 'user'])
+
+    def test_agentMatcher_first_match(self):
+        agents = [Agent('Smith, Jon'), Agent('Smith, John')]
+        for blocking in [False, True]:
+            matcher = AgentMatcher(agents, blocking=blocking)
+            self.assertIs(matcher.findMatch('SMITH, JOHN'), agents[0])
+            self.assertIsNone(matcher.findMatch('Garcia, Maria'))
+
+    def test_agentMatcher_blocking_keys(self):
+        self.assertEqual(
+            AgentMatcher.blockingKeys('smith, john, 1900-1950'),
+            {'sm', 'smi', 'joh', '190', '195'}
+        )
+
+    def test_agent_scoreNames(self):
+        names = ['Smith, John', 'Garcia, Maria']
+        agents = [Agent('SMITH, JON'), Agent('Garcia, M.'), Agent('Lee, Wei')]
+        scores = Agent.scoreNames(names, agents)
+        self.assertEqual(len(scores), 2)
+        for name, row in zip(names, scores):
+            self.assertEqual(len(row), 3)
+            for agent, score in zip(agents, row):
+                self.assertAlmostEqual(score, jaro_winkler(
+                    agent.name.lower(), name.lower()
+                ))
+
+    @patch('lib.dataModel.numpy', None)
+    def test_agent_scoreNames_without_numpy(self):
+        scores = Agent.scoreNames(['Test'], [Agent('test'), Agent('Other')])
+        self.assertEqual(scores[0][0], 1.0)
+        self.assertLess(scores[0][1], 0.8)
+
+    def test_agent_topMatches(self):
+        agents = [Agent('Smith, Jon'), Agent('Lee, Wei'), Agent('Smith, John')]
+        matches = Agent.topMatches(
+            ['Smith, John', 'Garcia, Maria'], agents, limit=2
+        )
+        self.assertEqual(
+            [agent for agent, _ in matches[0]], [agents[2], agents[0]]
+        )
+        self.assertEqual(matches[0][0][1], 1.0)
+        self.assertEqual(matches[1], [])
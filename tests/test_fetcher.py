@@ -1,11 +1,15 @@
 import unittest
 from unittest.mock import patch, mock_open, call
 
-from lib.recordFetch import fetchData
+from lib.recordFetch import fetchData, fetchBatch
+from lib.readers.oclcLookup import MARC_CACHE
 from helpers.errorHelpers import OCLCError, DataError
 
 
 class TestFetcher(unittest.TestCase):
+    def setUp(self):
+        MARC_CACHE.clear()
+
     @patch.dict('os.environ', {'OUTPUT_KINESIS': 'tester', 'OUTPUT_REGION': 'us-test-1'})
     @patch('lib.recordFetch.readFromMARC')
     @patch('lib.recordFetch.lookupRecord')
@@ -16,3 +20,80 @@ class TestFetcher(unittest.TestCase):
     def test_non_oclc_identifier(self):
         with self.assertRaises(OCLCError):
             fetchData('000000000', 'isbn')
+
+    @patch('lib.recordFetch.fetchData')
+    def test_batch_fetcher(self, mock_fetch):
+        mock_fetch.side_effect = lambda iden, idenType: 'record{}'.format(iden)
+        res = fetchBatch(['1', '2'], 'oclc', workers=2)
+        self.assertEqual(res, {
+            '1': {'status': 200, 'data': 'record1'},
+            '2': {'status': 200, 'data': 'record2'}
+        })
+
+    @patch('lib.recordFetch.fetchData')
+    def test_batch_duplicates(self, mock_fetch):
+        mock_fetch.side_effect = lambda iden, idenType: 'record{}'.format(iden)
+        res = fetchBatch(['1', '2', '1'], 'oclc', workers=2)
+        self.assertEqual(list(res.keys()), ['1', '2'])
+        self.assertEqual(mock_fetch.call_count, 2)
+
+    @patch('lib.recordFetch.fetchData')
+    def test_batch_partial_failure(self, mock_fetch):
+        def fakeFetch(iden, idenType):
+            if iden == '2':
+                raise OCLCError('Test Error')
+            return 'record{}'.format(iden)
+
+        mock_fetch.side_effect = fakeFetch
+        res = fetchBatch(['1', '2', '3'], 'oclc', workers=2)
+        self.assertEqual(res['1']['status'], 200)
+        self.assertEqual(res['2'], {
+            'status': 500, 'data': {'message': 'Test Error'}
+        })
+        self.assertEqual(res['3']['data'], 'record3')
+
+    @patch.dict('os.environ', {'PARSE_PROCESSES': '2'})
+    @patch('lib.recordFetch.fetchMARCXML')
+    def test_batch_process_pool(self, mock_fetch):
+        record = (
+            '<record><controlfield tag="001">{0}</controlfield>'
+            '<controlfield tag="008">850101s1923    nyu           000 0 eng d'
+            '</controlfield><datafield tag="245" ind1="1" ind2="0">'
+            '<subfield code="a">Title {0}</subfield></datafield></record>'
+        )
+
+        def fakeFetch(iden):
+            if iden == '2':
+                raise OCLCError('Test Error')
+            if iden == '3':
+                return '<record></record>'
+            if iden == '5':
+                raise ConnectionError('Connection Error')
+            return record.format(iden)
+
+        mock_fetch.side_effect = fakeFetch
+        res = fetchBatch(['1', '2', '3', '4', '5'], 'oclc', workers=2)
+        self.assertEqual(list(res.keys()), ['1', '2', '3', '4', '5'])
+        self.assertEqual(res['1']['status'], 200)
+        self.assertEqual(res['1']['data']['title'], 'Title 1')
+        self.assertEqual(res['2'], {
+            'status': 500, 'data': {'message': 'Test Error'}
+        })
+        self.assertEqual(res['3']['status'], 500)
+        self.assertEqual(res['4']['data']['title'], 'Title 4')
+        self.assertIsNotNone(MARC_CACHE.get('1'))
+        self.assertIsNone(MARC_CACHE.get('3'))
+
+        self.assertEqual(res['5'], {
+            'status': 500, 'data': {'message': 'Connection Error'}
+        })
+
+        fetchBatch(['1'], 'oclc', workers=2)
+        self.assertEqual(mock_fetch.call_count, 5)
+
+    @patch.dict('os.environ', {'PARSE_PROCESSES': '2'})
+    @patch('lib.recordFetch.fetchMARCXML')
+    def test_batch_process_pool_non_oclc(self, mock_fetch):
+        res = fetchBatch(['1'], 'isbn')
+        self.assertEqual(res['1']['status'], 500)
+        mock_fetch.assert_not_called()
@@ -1,13 +1,15 @@
 import json
 import unittest
-from unittest.mock import patch, mock_open, call
+from unittest.mock import patch, mock_open, call, MagicMock
 
 # Set this variable here as it gets checked at loadtime
 import os
 os.environ['OUTPUT_REGION'] = 'us-test-1'
 
 from service import handler
-from helpers.errorHelpers import NoRecordsReceived, OCLCError, DataError
+from helpers.errorHelpers import (
+    NoRecordsReceived, OCLCError, DataError, KinesisError
+)
 from lib.outPutManager import OutputManager
 
 
@@ -53,3 +55,145 @@ class TestHandler(unittest.TestCase):
         self.assertEqual(resp, 'outObject')
         mockFetch.assert_called_once_with('000000000', 'oclc')
         mockResponse.assert_called_once_with(500, {'message': 'Test Error'})
+
+    @patch('service.fetchBatch', return_value='batchResponse')
+    @patch.object(OutputManager, 'formatResponse', return_value='outObject')
+    def test_handler_batch(self, mockResponse, mockBatch):
+        testRec = {
+            'body': json.dumps({
+                'identifiers': ['000000001', '000000002'],
+                'type': 'oclc'
+            })
+        }
+        resp = handler(testRec, None)
+        self.assertEqual(resp, 'outObject')
+        mockBatch.assert_called_once_with(['000000001', '000000002'], 'oclc')
+        mockResponse.assert_called_once_with(200, 'batchResponse')
+
+    @patch('service.fetchBatch')
+    @patch.object(OutputManager, 'formatResponse', return_value='outObject')
+    def test_handler_batch_bad_body(self, mockResponse, mockBatch):
+        testRec = {'body': '{"identifiers": ["000000001"]}'}
+        resp = handler(testRec, None)
+        self.assertEqual(resp, 'outObject')
+        mockBatch.assert_not_called()
+        mockResponse.assert_called_once_with(
+            400,
+            {'message': 'Batch request body must include identifiers and type'}
+        )
+
+    @patch('service.fetchBatch')
+    @patch.object(OutputManager, 'formatResponse', return_value='outObject')
+    def test_handler_batch_empty_list(self, mockResponse, mockBatch):
+        testRec = {'body': '{"identifiers": [], "type": "oclc"}'}
+        handler(testRec, None)
+        mockBatch.assert_not_called()
+        mockResponse.assert_called_once_with(
+            400,
+            {'message': 'Batch identifiers must be a non-empty list'}
+        )
+
+    @patch('service.fetchBatch')
+    @patch.object(OutputManager, 'formatResponse', return_value='outObject')
+    def test_handler_batch_bad_identifiers(self, mockResponse, mockBatch):
+        for identifiers in [[['1']], [{'iden': '1'}], ['1', None], [True]]:
+            mockResponse.reset_mock()
+            testRec = {'body': json.dumps({
+                'identifiers': identifiers, 'type': 'oclc'
+            })}
+            handler(testRec, None)
+            mockResponse.assert_called_once_with(
+                400,
+                {'message': 'Batch identifiers must be strings or numbers'}
+            )
+        mockBatch.assert_not_called()
+
+    @patch('service.fetchBatch', return_value='batchResponse')
+    @patch.object(OutputManager, 'formatResponse', return_value='outObject')
+    def test_handler_batch_numeric_identifiers(self, mockResponse, mockBatch):
+        testRec = {'body': '{"identifiers": [1, "2"], "type": "oclc"}'}
+        handler(testRec, None)
+        mockBatch.assert_called_once_with(['1', '2'], 'oclc')
+
+    @patch.dict('os.environ', {'OUTPUT_KINESIS': 'testStream'})
+    @patch.object(OutputManager, 'createBuffer')
+    @patch('service.fetchData')
+    def test_handler_sqs_partial_failure(self, mockFetch, mockCreate):
+        def fakeFetch(iden, idenType):
+            if iden == '2':
+                raise OCLCError('Test Error')
+            return 'record{}'.format(iden)
+
+        mockFetch.side_effect = fakeFetch
+        mockBuffer = MagicMock()
+        mockBuffer.failed = []
+        mockCreate.return_value.__enter__.return_value = mockBuffer
+        testRec = {
+            'Records': [
+                {
+                    'messageId': 'msg{}'.format(i),
+                    'body': json.dumps({'identifier': str(i), 'type': 'oclc'})
+                }
+                for i in range(1, 4)
+            ] + [{'messageId': 'msg4', 'body': 'not json'}]
+        }
+        resp = handler(testRec, None)
+        self.assertEqual(resp, {
+            'batchItemFailures': [
+                {'itemIdentifier': 'msg2'},
+                {'itemIdentifier': 'msg4'}
+            ]
+        })
+        mockCreate.assert_called_once_with('testStream')
+        mockBuffer.add.assert_has_calls([
+            call(
+                {'type': 'instance', 'method': 'update', 'data': 'record1'},
+                '1',
+                tag='msg1'
+            ),
+            call(
+                {'type': 'instance', 'method': 'update', 'data': 'record3'},
+                '3',
+                tag='msg3'
+            )
+        ])
+
+    @patch.dict('os.environ', {'OUTPUT_KINESIS': 'testStream'})
+    @patch.object(OutputManager, 'createBuffer')
+    @patch('service.fetchData', return_value='record')
+    def test_handler_sqs_output_failure(self, mockFetch, mockCreate):
+        mockBuffer = MagicMock()
+        mockBuffer.add.side_effect = [None, KinesisError('too large'), None]
+        mockBuffer.failed = ['msg3']
+        mockCreate.return_value.__enter__.return_value = mockBuffer
+        testRec = {
+            'Records': [
+                {
+                    'messageId': 'msg{}'.format(i),
+                    'body': json.dumps({'identifier': str(i), 'type': 'oclc'})
+                }
+                for i in range(1, 4)
+            ]
+        }
+        resp = handler(testRec, None)
+        self.assertEqual(resp, {
+            'batchItemFailures': [
+                {'itemIdentifier': 'msg2'},
+                {'itemIdentifier': 'msg3'}
+            ]
+        })
+
+    @patch('helpers.metricsHelpers.emitMetrics')
+    @patch('service.fetchData', return_value='record')
+    def test_handler_records_metrics(self, mockFetch, mockEmit):
+        testRec = {
+            'queryStringParameters': {
+                'identifier': '000000000',
+                'type': 'oclc'
+            }
+        }
+        handler(testRec, None)
+        mockEmit.assert_called_once()
+        metrics = mockEmit.call_args[0][0]
+        self.assertEqual(metrics.name, 'lookup')
+        self.assertEqual(metrics.getStages()['json_encode']['count'], 1)
@@ -1,11 +1,18 @@
 import unittest
 from unittest.mock import call, DEFAULT, MagicMock, patch
 
-from lib.parsers.parse856Holding import HoldingParser
+from lib.parsers.parse856Holding import (
+    HoldingParser, HATHI_VOLUME_CACHE, HATHI_REDIRECT_CACHE, IA_STATUS_CACHE
+)
 from helpers.errorHelpers import HoldingError
 
 
 class TestHoldingParse(unittest.TestCase):
+    def setUp(self):
+        HATHI_VOLUME_CACHE.clear()
+        HATHI_REDIRECT_CACHE.clear()
+        IA_STATUS_CACHE.clear()
+
     def test_create_class(self):
         testInst = HoldingParser('mock856', 'mockInstance')
         self.assertIsInstance(testInst, HoldingParser)
@@ -139,6 +146,20 @@ class TestHoldingParse(unittest.TestCase):
         self.assertEqual(testInst.matchEbook(), None)
         mockParseHathi.assert_called_once()
 
+    @patch.multiple(
+        HoldingParser, checkIAStatus=DEFAULT, parseHathiLink=DEFAULT
+    )
+    def test_matchEbook_offline(self, checkIAStatus, parseHathiLink):
+        testInst = HoldingParser('856Field', MagicMock(), offline=True)
+        for uri in [
+            'archive.org/details/testwork00',
+            'catalog.hathitrust.org/api/volumes/oclc/123456789.html'
+        ]:
+            testInst.uri = uri
+            self.assertEqual(testInst.matchEbook(), None)
+        checkIAStatus.assert_not_called()
+        parseHathiLink.assert_not_called()
+
     def test_matchIdentifier(self):
         mockInstance = MagicMock()
         testInst = HoldingParser('856Field', mockInstance)
@@ -148,6 +169,42 @@ class TestHoldingParse(unittest.TestCase):
             type='oclc', identifier='123465', weight=0.8
         )
 
+    @patch.object(HoldingParser, 'loadCatalogLinks')
+    def test_extractBookLinks_hathi_catalog_identifier(self, mockLoad):
+        mockInstance = MagicMock()
+        testInst = HoldingParser('856Field', mockInstance)
+        testInst.uri = (
+            'https://catalog.hathitrust.org/api/volumes/oclc/1234567.html'
+        )
+        testInst.extractBookLinks()
+        mockLoad.assert_called_once()
+        mockInstance.addIdentifier.assert_called_once_with(
+            type='oclc', identifier='1234567', weight=0.8
+        )
+        mockInstance.links.append.assert_not_called()
+
+    def test_classifyURI_ebook(self):
+        uriClass = HoldingParser.classifyURI(
+            'https://archive.org/details/testwork00'
+        )
+        self.assertEqual(uriClass.source, 'internetarchive')
+        self.assertEqual(uriClass.identifier, 'testwork00')
+        self.assertEqual(uriClass.kind, 'ebook')
+
+    def test_classifyURI_identifier(self):
+        uriClass = HoldingParser.classifyURI('http://worldcat.org/oclc/123465')
+        self.assertEqual(uriClass, ('oclc', '123465', 'identifier'))
+
+    def test_classifyURI_link(self):
+        uriClass = HoldingParser.classifyURI('http://www.test.org/123-abc.pdf')
+        self.assertEqual(uriClass, ('unknown', '123-abc', 'link'))
+
+    def test_matchEbook_no_match_keeps_source(self):
+        testInst = HoldingParser('856Field', MagicMock())
+        testInst.uri = 'http://www.test.org/test123.pdf'
+        testInst.matchEbook()
+        self.assertEqual(testInst.source, 'unknown')
+
     @patch('lib.parsers.parse856Holding.requests')
     def test_checkIAStatus_not_restricted(self, mockReq):
         testInst = HoldingParser('mock856', 'mockInstance')
@@ -155,13 +212,12 @@ class TestHoldingParse(unittest.TestCase):
 
         mockResp = MagicMock()
         mockResp.status_code = 200
-        mockResp.json.return_value = {
-            'metadata': {
-                'access-restricted-item': False
-            }
-        }
+        mockResp.json.return_value = {'result': False}
         mockReq.get.return_value = mockResp
         self.assertFalse(testInst.checkIAStatus())
+        mockReq.get.assert_called_once_with(
+            'archive.org/detail/testwork00/metadata/access-restricted-item'
+        )
 
     @patch('lib.parsers.parse856Holding.requests')
     def test_checkIAStatus_restricted(self, mockReq):
@@ -170,14 +226,49 @@ class TestHoldingParse(unittest.TestCase):
 
         mockResp = MagicMock()
         mockResp.status_code = 200
-        mockResp.json.return_value = {
-            'metadata': {
-                'access-restricted-item': True
-            }
-        }
+        mockResp.json.return_value = {'result': True}
         mockReq.get.return_value = mockResp
         self.assertTrue(testInst.checkIAStatus())
 
+    @patch('lib.parsers.parse856Holding.requests')
+    def test_checkIAStatus_missing_field(self, mockReq):
+        testInst = HoldingParser('mock856', 'mockInstance')
+        testInst.uri = 'archive.org/details/testwork00'
+
+        mockResp = MagicMock()
+        mockResp.status_code = 200
+        mockResp.json.return_value = {}
+        mockReq.get.return_value = mockResp
+        self.assertFalse(testInst.checkIAStatus())
+
+    @patch('lib.parsers.parse856Holding.requests')
+    def test_checkIAStatus_cached(self, mockReq):
+        mockResp = MagicMock()
+        mockResp.status_code = 200
+        mockResp.json.return_value = {'result': False}
+        mockReq.get.return_value = mockResp
+
+        for uri in ['http://archive.org/details/testwork00',
+                    'https://archive.org/details/testwork00']:
+            testInst = HoldingParser('mock856', 'mockInstance')
+            testInst.uri = uri
+            self.assertFalse(testInst.checkIAStatus())
+
+        mockReq.get.assert_called_once()
+
+    @patch('lib.parsers.parse856Holding.IA_STATUS_CACHE')
+    @patch('lib.parsers.parse856Holding.requests')
+    def test_checkIAStatus_failure_negative_cache(self, mockReq, mockCache):
+        mockCache.get.return_value = None
+        mockResp = MagicMock()
+        mockResp.status_code = 503
+        mockReq.get.return_value = mockResp
+
+        testInst = HoldingParser('mock856', 'mockInstance')
+        testInst.uri = 'archive.org/details/testwork00'
+        self.assertTrue(testInst.checkIAStatus())
+        mockCache.set.assert_called_once_with('testwork00', True, ttl=300)
+
     @patch.object(HoldingParser, 'loadCatalogLinks')
     def test_parseHathiLink(self, mockLoad):
         testInst = HoldingParser('mock856', 'mockInstance')
@@ -193,17 +284,17 @@ class TestHoldingParse(unittest.TestCase):
         mockLoad.assert_not_called()
 
     @patch.multiple(
-        HoldingParser, fetchHathiItems=DEFAULT, startHathiMultiprocess=DEFAULT
+        HoldingParser, fetchHathiItems=DEFAULT, startHathiFetch=DEFAULT
     )
     def test_loadCatalogLinks_match_hathiID(
-        self, fetchHathiItems, startHathiMultiprocess
+        self, fetchHathiItems, startHathiFetch
     ):
         testInst = HoldingParser('mock856', 'mockInstance')
         testInst.uri = 'catalog.hathitrust.org/volumes/oclc/0123456.html'
         fetchHathiItems.return_value = ['item1', 'item2', 'item3']
         testInst.loadCatalogLinks()
         fetchHathiItems.assert_called_once()
-        startHathiMultiprocess.assert_called_once_with([
+        startHathiFetch.assert_called_once_with([
             'item1', 'item2', 'item3'
         ])
 
@@ -218,6 +309,43 @@ class TestHoldingParse(unittest.TestCase):
         testItems = testInst.fetchHathiItems('test.132456')
         self.assertEqual(testItems, 'itemList') 
 
+    @patch('lib.parsers.parse856Holding.requests')
+    def test_fetchHathiItems_cached(self, mockReq):
+        mockResp = MagicMock()
+        mockResp.status_code = 200
+        mockResp.json.return_value = {'items': ['item1']}
+        mockReq.get.return_value = mockResp
+
+        testInst = HoldingParser('mock856', 'mockInstance')
+        testInst.fetchHathiItems('test.132456')
+        testItems = testInst.fetchHathiItems('test.132456')
+        self.assertEqual(testItems, ['item1'])
+        mockReq.get.assert_called_once()
+
+    @patch('lib.parsers.parse856Holding.requests')
+    def test_fetchHathiItems_error_not_cached(self, mockReq):
+        mockResp = MagicMock()
+        mockResp.status_code = 500
+        mockReq.get.return_value = mockResp
+
+        testInst = HoldingParser('mock856', 'mockInstance')
+        self.assertIsNone(testInst.fetchHathiItems('test.132456'))
+        testInst.fetchHathiItems('test.132456')
+        self.assertEqual(mockReq.get.call_count, 2)
+
+    @patch('lib.parsers.parse856Holding.requests')
+    def test_resolveItemURL_cached(self, mockReq):
+        mockResp = MagicMock()
+        mockResp.headers = {
+            'Location': 'https://hathitrust.org/test?id=test.123465'
+        }
+        mockReq.head.return_value = mockResp
+
+        for _ in range(2):
+            realURL = HoldingParser.resolveItemURL('hathitrust.org/redirect')
+            self.assertEqual(realURL, 'hathitrust.org/test?id=test.123465')
+        mockReq.head.assert_called_once_with('hathitrust.org/redirect')
+
     def test_getNewItemLinks_not_pd(self):
         testItem = {
             'rightsCode': 'ic-world'
@@ -267,43 +395,22 @@ class TestHoldingParse(unittest.TestCase):
             )
         ])
 
-    def test_startHathiMultiprocess(self):
-        def fakeProcess(items, conn):
-            for i in items:
-                conn.send(i)
-            conn.send('DONE')
-            conn.close()
-        
-        with patch.object(HoldingParser, 'processHathiChunk', wraps=fakeProcess) as mockChunk:
-            mockInstance = MagicMock()
-            testInst = HoldingParser('mock856', mockInstance)
-            testInst.startHathiMultiprocess([{'test': 1}, {'test': 2}])
-
-            mockInstance.addFormat.assert_has_calls([call(test=1), call(test=2)])
-
-    def test_startHathiMultiprocess_raiseEOF(self):
-        def fakeProcess(items, conn):
-            for i in items:
-                conn.send(i)
-            conn.close()
-        
-        with patch.object(HoldingParser, 'processHathiChunk', wraps=fakeProcess) as mockChunk:
-            mockInstance = MagicMock()
-            testInst = HoldingParser('mock856', mockInstance)
-            testInst.startHathiMultiprocess([{'test': 1}, {'test': 2}])
+    @patch.object(HoldingParser, 'getNewItemLinks')
+    def test_startHathiFetch(self, mockGetNew):
+        mockGetNew.side_effect = lambda item: item if item['test'] != 2 else None
+        mockInstance = MagicMock()
+        testInst = HoldingParser('mock856', mockInstance)
+        testInst.startHathiFetch([{'test': 1}, {'test': 2}, {'test': 3}])
 
-            mockInstance.addFormat.assert_has_calls([call(test=1), call(test=2)])
+        mockInstance.addFormat.assert_has_calls([call(test=1), call(test=3)])
+        self.assertEqual(mockInstance.addFormat.call_count, 2)
 
     @patch.object(HoldingParser, 'getNewItemLinks')
-    def test_processHathiChunk(self, mockGetNew):
-        testInst = HoldingParser('mock856', 'mockInstance')
-        mockGetNew.side_effect = ['item1', None, 'item2']
-        mockConn = MagicMock()
-
-        testInst.processHathiChunk([1, 2, 3], mockConn)
+    def test_startHathiFetch_item_error(self, mockGetNew):
+        mockGetNew.side_effect = [{'test': 1}, KeyError('Location')]
+        mockInstance = MagicMock()
+        testInst = HoldingParser('mock856', mockInstance)
+        with patch.dict('os.environ', {'IO_POOL_THRESHOLD': '10'}):
+            testInst.startHathiFetch([{'test': 1}, {'test': 2}])
 
-        mockGetNew.assert_has_calls([call(1), call(2), call(3)])
-        mockConn.send.assert_has_calls([
-            call('item1'), call('item2'), call('DONE')]
-        )
-        mockConn.close.assert_called_once()
+        mockInstance.addFormat.assert_called_once_with(test=1)
@@ -0,0 +1,30 @@
+import json
+import unittest
+from unittest.mock import patch
+
+from helpers.importHelpers import LazyModule, lazyImport, optionalImport
+
+
+class TestImportHelpers(unittest.TestCase):
+    @patch('helpers.importHelpers.importlib.import_module')
+    def test_lazy_import_deferred(self, mockImport):
+        lazyModule = lazyImport('json')
+        mockImport.assert_not_called()
+
+        mockImport.return_value = json
+        self.assertIs(lazyModule.dumps, json.dumps)
+        lazyModule.loads
+        mockImport.assert_called_once_with('json')
+
+    def test_lazy_module_patch(self):
+        lazyModule = LazyModule('json')
+        with patch.object(lazyModule, 'dumps', return_value='patched'):
+            self.assertEqual(json.dumps({}), 'patched')
+            self.assertEqual(lazyModule.dumps({}), 'patched')
+        self.assertEqual(lazyModule.dumps({}), '{}')
+
+    def test_optional_import_missing(self):
+        self.assertIsNone(optionalImport('not_a_real_module'))
+
+    def test_optional_import_installed(self):
+        self.assertIsInstance(optionalImport('json'), LazyModule)
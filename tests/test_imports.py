@@ -0,0 +1,59 @@
+import json
+import os
+import subprocess
+import sys
+import unittest
+
+from scripts.benchmarks import profileImports
+
+# Modules that must not be imported until they are first used, as they are
+# not needed to respond to every invocation
+DEFERRED_MODULES = [
+    'asyncio', 'boto3', 'botocore', 'configparser', 'Levenshtein', 'lxml',
+    'marcalyx', 'multiprocessing', 'orjson', 'rapidfuzz', 'requests',
+    'sqlite3', 'yaml'
+]
+
+# Maximum time in seconds to import service, as recorded by -X importtime.
+# This is several times the usual import time so that the test is not
+# affected by the load on the machine running it, and can be raised further
+# with IMPORT_BUDGET on slow runners
+IMPORT_BUDGET = float(os.environ.get('IMPORT_BUDGET', 1.0))
+
+
+def importedModules(moduleName):
+    """Import a module in a new interpreter, returning the names of all of
+    the modules in sys.modules after it is imported"""
+    importRun = subprocess.run(
+        [sys.executable, '-c', (
+            'import json, sys, {}; print(json.dumps(list(sys.modules)))'
+        ).format(moduleName)],
+        stdout=subprocess.PIPE, universal_newlines=True, check=True
+    )
+    return json.loads(importRun.stdout.splitlines()[-1])
+
+
+class TestImports(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.modules = importedModules('service')
+        cls.importTimes = profileImports('service')
+
+    def test_service_imported(self):
+        self.assertIn('service', self.modules)
+
+    def test_deferred_modules(self):
+        imported = [
+            module for module in self.modules
+            if module.split('.')[0] in DEFERRED_MODULES
+        ]
+        self.assertEqual(imported, [])
+
+    def test_import_budget(self):
+        slowest = sorted(
+            self.importTimes.items(), key=lambda x: x[1], reverse=True
+        )[:10]
+        self.assertLess(
+            self.importTimes['service'], IMPORT_BUDGET,
+            'Slowest imports: {}'.format(slowest)
+        )
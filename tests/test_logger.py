@@ -1,8 +1,12 @@
-import unittest
+import json
 import logging
 import os
+import sys
+import unittest
+from unittest.mock import MagicMock, patch
 
-from helpers.logHelpers import createLog
+from helpers import logHelpers
+from helpers.logHelpers import createLog, DebugSampleFilter, JSONFormatter
 
 
 class TestLogger(unittest.TestCase):
@@ -28,3 +32,68 @@ class TestLogger(unittest.TestCase):
         level = logger.getEffectiveLevel()
         self.assertEqual(level, logging.WARNING)
         del os.environ['LOG_LEVEL']
+
+    def test_log_handler_reused(self):
+
+        logger = createLog('tester')
+        createLog('tester')
+        otherLogger = createLog('other_tester')
+        self.assertEqual(len(logger.handlers), 1)
+        self.assertIs(logger.handlers[0], otherLogger.handlers[0])
+
+    def test_log_json_format(self):
+
+        os.environ['LOG_FORMAT'] = 'json'
+        createLog('tester')
+        record = logging.LogRecord(
+            'tester', logging.ERROR, __file__, 1, 'Failed %s', ('test',), None
+        )
+        outJSON = json.loads(logHelpers.CONSOLE_HANDLER.format(record))
+        self.assertEqual(outJSON['logger'], 'tester')
+        self.assertEqual(outJSON['level'], 'ERROR')
+        self.assertEqual(outJSON['message'], 'Failed test')
+        del os.environ['LOG_FORMAT']
+
+    def test_log_json_exception(self):
+
+        try:
+            raise ValueError('test error')
+        except ValueError:
+            record = logging.LogRecord(
+                'tester', logging.ERROR, __file__, 1, 'Failed', (),
+                sys.exc_info()
+            )
+        outJSON = json.loads(JSONFormatter().format(record))
+        self.assertIn('ValueError: test error', outJSON['exception'])
+
+    @patch('helpers.logHelpers.random.random', side_effect=[0.2, 0.8])
+    def test_debug_sample_filter(self, mockRandom):
+
+        testFilter = DebugSampleFilter(0.5)
+        debugRecord = logging.LogRecord(
+            'tester', logging.DEBUG, __file__, 1, 'Debug', (), None
+        )
+        errorRecord = logging.LogRecord(
+            'tester', logging.ERROR, __file__, 1, 'Error', (), None
+        )
+        self.assertTrue(testFilter.filter(debugRecord))
+        self.assertFalse(testFilter.filter(debugRecord))
+        self.assertTrue(testFilter.filter(errorRecord))
+        self.assertEqual(mockRandom.call_count, 2)
+
+    def test_log_sample_rate(self):
+
+        os.environ['LOG_DEBUG_SAMPLE_RATE'] = '0.1'
+        createLog('tester')
+        sampleFilter = logHelpers.CONSOLE_HANDLER.filters[0]
+        self.assertEqual(sampleFilter.rate, 0.1)
+        del os.environ['LOG_DEBUG_SAMPLE_RATE']
+        createLog('tester')
+        self.assertEqual(sampleFilter.rate, 1.0)
+
+    def test_log_lazy_format(self):
+
+        logger = createLog('tester')
+        mockArg = MagicMock()
+        logger.debug('Not formatted %s', mockArg)
+        mockArg.__str__.assert_not_called()
@@ -1,14 +1,21 @@
+from concurrent.futures import ThreadPoolExecutor
 import unittest
 from unittest.mock import patch, mock_open, call
 from collections import namedtuple
 from lxml import etree
 from requests.exceptions import ConnectionError
 
-from lib.readers.oclcLookup import lookupRecord, parseMARC, catalogLookup, createURL
+from lib.readers.oclcLookup import (
+    lookupRecord, parseMARC, catalogLookup, createURL, getSession,
+    fetchMARCXML, MARC_CACHE
+)
 
 from helpers.errorHelpers import OCLCError, DataError
 
 class TestLookup(unittest.TestCase):
+    def setUp(self):
+        getSession()
+        MARC_CACHE.clear()
 
     @patch('lib.readers.oclcLookup.createURL')
     @patch('lib.readers.oclcLookup.catalogLookup')
@@ -56,7 +63,7 @@ class TestLookup(unittest.TestCase):
     reqReturn = namedtuple('Return', ['status_code', 'text'])
     reqReturn.status_code=200
     reqReturn.text = True
-    @patch('lib.readers.oclcLookup.requests.get', return_value=reqReturn)
+    @patch('lib.readers.oclcLookup.SESSION.get', return_value=reqReturn)
     def test_requests_success(self, mock_request):
         res = catalogLookup('url')
         self.assertTrue(res)
@@ -64,7 +71,7 @@ class TestLookup(unittest.TestCase):
     failReturn = namedtuple('Return', ['status_code', 'text'])
     failReturn.status_code=500
     failReturn.body='error'
-    @patch('lib.readers.oclcLookup.requests.get', return_value=failReturn)
+    @patch('lib.readers.oclcLookup.SESSION.get', return_value=failReturn)
     def test_requests_err(self, mock_request):
         try:
             res = catalogLookup('url')
@@ -75,7 +82,7 @@ class TestLookup(unittest.TestCase):
     reqReturn = namedtuple('Return', ['status_code', 'text'])
     reqReturn.status_code=200
     reqReturn.text = True
-    @patch('lib.readers.oclcLookup.requests.get', side_effect=[ConnectionError, reqReturn])
+    @patch('lib.readers.oclcLookup.SESSION.get', side_effect=[ConnectionError, reqReturn])
     def test_requests_retry_success(self, mock_request):
         res = catalogLookup('url')
         self.assertTrue(res)
@@ -84,3 +91,44 @@ class TestLookup(unittest.TestCase):
     def test_create_url(self):
         res = createURL('00000000')
         self.assertEqual(res, 'http://www.worldcat.org/webservices/catalog/content/00000000?wskey=000')
+
+    def test_session_reused(self):
+        self.assertIs(getSession(), getSession())
+
+    @patch.dict('os.environ', {'OCLC_CONCURRENCY': '3'})
+    @patch('lib.readers.oclcLookup.SESSION', None)
+    def test_session_concurrency_limit(self):
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            sessions = set(executor.map(lambda x: getSession(), range(8)))
+
+        self.assertEqual(len(sessions), 1)
+        adapter = sessions.pop().get_adapter('https://www.worldcat.org')
+        self.assertEqual(adapter._pool_maxsize, 3)
+        self.assertTrue(adapter._pool_block)
+
+    @patch.dict('os.environ', {'OCLC_KEY': '000'})
+    @patch('lib.readers.oclcLookup.parseMARC', return_value='record')
+    @patch('lib.readers.oclcLookup.catalogLookup', return_value='<marc/>')
+    def test_lookup_record_cached(self, mock_catalog, mock_parse):
+        self.assertEqual(lookupRecord('00000000'), 'record')
+        self.assertEqual(lookupRecord('00000000'), 'record')
+        mock_catalog.assert_called_once()
+        self.assertEqual(mock_parse.call_count, 2)
+        self.assertEqual(MARC_CACHE.stats()['memory']['hits'], 1)
+        self.assertEqual(MARC_CACHE.stats()['memory']['misses'], 1)
+
+    @patch.dict('os.environ', {'OCLC_KEY': '000'})
+    @patch('lib.readers.oclcLookup.catalogLookup', return_value='<html>not marc')
+    def test_lookup_record_invalid_not_cached(self, mock_catalog):
+        with self.assertRaises(OCLCError):
+            lookupRecord('00000000')
+        with self.assertRaises(OCLCError):
+            lookupRecord('00000000')
+        self.assertEqual(mock_catalog.call_count, 2)
+        self.assertIsNone(MARC_CACHE.get('00000000'))
+
+    @patch.dict('os.environ', {'OCLC_KEY': '000'})
+    @patch('lib.readers.oclcLookup.catalogLookup', return_value='<marc/>')
+    def test_fetch_marcxml_not_cached(self, mock_catalog):
+        self.assertEqual(fetchMARCXML('00000000'), '<marc/>')
+        self.assertIsNone(MARC_CACHE.get('00000000'))
@@ -0,0 +1,117 @@
+import json
+import threading
+import unittest
+from unittest.mock import patch
+
+from helpers.metricsHelpers import (
+    RequestMetrics, trackRequest, timeStage, timed, getCurrentMetrics,
+    getServerTiming
+)
+from helpers.poolHelpers import mapIO
+from lib.outPutManager import OutputManager
+
+
+@timed('test_stage')
+def timedStage(value):
+    return value
+
+
+class TestMetrics(unittest.TestCase):
+    def test_stage_outside_request(self):
+        with timeStage('test_stage'):
+            pass
+        self.assertIsNone(getCurrentMetrics())
+        self.assertEqual(timedStage(1), 1)
+
+    @patch('helpers.metricsHelpers.emitMetrics')
+    def test_track_request(self, mockEmit):
+        with trackRequest('test') as metrics:
+            self.assertIs(getCurrentMetrics(), metrics)
+            timedStage(1)
+            timedStage(2)
+            with timeStage('other_stage'):
+                pass
+
+        self.assertIsNone(getCurrentMetrics())
+        mockEmit.assert_called_once_with(metrics)
+        stages = metrics.getStages()
+        self.assertEqual(stages['test_stage']['count'], 2)
+        self.assertEqual(stages['other_stage']['count'], 1)
+        self.assertIsNotNone(metrics.duration)
+
+    @patch('helpers.metricsHelpers.emitMetrics')
+    def test_metrics_propagated_to_pool(self, mockEmit):
+        with trackRequest('test') as metrics:
+            mapIO(timedStage, [1, 2, 3, 4], threshold=2)
+
+        self.assertEqual(metrics.getStages()['test_stage']['count'], 4)
+
+    @patch('helpers.metricsHelpers.emitMetrics')
+    def test_metrics_thread_local(self, mockEmit):
+        threadMetrics = []
+        with trackRequest('outer') as outer:
+            with trackRequest('inner') as inner:
+                self.assertIs(getCurrentMetrics(), inner)
+            self.assertIs(getCurrentMetrics(), outer)
+
+            thread = threading.Thread(
+                target=lambda: threadMetrics.append(getCurrentMetrics())
+            )
+            thread.start()
+            thread.join()
+
+        self.assertEqual(threadMetrics, [None])
+
+    def test_log_record(self):
+        metrics = RequestMetrics('test')
+        metrics.record('oclc_fetch', 0.5)
+        metrics.record('oclc_fetch', 0.25)
+        metrics.finish()
+        logRecord = metrics.toLogRecord()
+        self.assertEqual(logRecord['request'], 'test')
+        self.assertEqual(
+            logRecord['stages'],
+            {'oclc_fetch': {'count': 2, 'duration': 750.0}}
+        )
+
+    def test_emf_record(self):
+        metrics = RequestMetrics('test')
+        metrics.record('oclc_fetch', 0.5)
+        metrics.finish()
+        emfRecord = metrics.toEMF('testNamespace')
+        metricDefs = emfRecord['_aws']['CloudWatchMetrics'][0]
+        self.assertEqual(metricDefs['Namespace'], 'testNamespace')
+        self.assertEqual(
+            [metric['Name'] for metric in metricDefs['Metrics']],
+            ['duration', 'oclc_fetch.duration', 'oclc_fetch.count']
+        )
+        self.assertEqual(emfRecord['oclc_fetch.duration'], 500.0)
+        self.assertEqual(emfRecord['oclc_fetch.count'], 1)
+
+    @patch.dict('os.environ', {'METRICS_FORMAT': 'emf'})
+    @patch('builtins.print')
+    def test_emit_emf(self, mockPrint):
+        with trackRequest('test'):
+            timedStage(1)
+
+        emfRecord = json.loads(mockPrint.call_args[0][0])
+        self.assertEqual(emfRecord['test_stage.count'], 1)
+
+    @patch.dict('os.environ', {'METRICS_HEADER': 'true'})
+    @patch('helpers.metricsHelpers.emitMetrics')
+    def test_server_timing_header(self, mockEmit):
+        self.assertIsNone(getServerTiming())
+        with trackRequest('test'):
+            timedStage(1)
+            response = OutputManager.formatResponse(200, {'test': 'data'})
+
+        serverTiming = response['headers']['Server-Timing']
+        self.assertIn('test_stage;dur=', serverTiming)
+        self.assertIn('json_encode;dur=', serverTiming)
+
+    @patch('helpers.metricsHelpers.emitMetrics')
+    def test_server_timing_disabled(self, mockEmit):
+        with trackRequest('test'):
+            response = OutputManager.formatResponse(200, {'test': 'data'})
+
+        self.assertNotIn('Server-Timing', response['headers'])
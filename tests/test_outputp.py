@@ -6,7 +6,7 @@ import json
 import os
 os.environ['OUTPUT_REGION'] = 'us-test-1'
 
-from lib.outPutManager import OutputManager
+from lib.outPutManager import OutputManager, KinesisBuffer
 from helpers.errorHelpers import KinesisError
 
 class TestKinesis(unittest.TestCase):
@@ -73,3 +73,121 @@ class TestKinesis(unittest.TestCase):
         except KinesisError:
             pass
         self.assertRaises(KinesisError)
+
+
+class TestKinesisBuffer(unittest.TestCase):
+    def setUp(self):
+        self.client = MagicMock()
+        self.client.put_records.return_value = {
+            'FailedRecordCount': 0, 'Records': []
+        }
+        self.buffer = KinesisBuffer(
+            'testStream', client=self.client, retries=2, backoff=0
+        )
+
+    def test_add_and_flush(self):
+        self.buffer.add({'data': 'test1'}, '1', tag='a')
+        self.buffer.add({'data': 'test2'}, '2', tag='b')
+        self.assertEqual(len(self.buffer), 2)
+        self.client.put_records.assert_not_called()
+
+        self.assertEqual(self.buffer.flush(), [])
+        self.client.put_records.assert_called_once_with(
+            StreamName='testStream',
+            Records=[
+                {'Data': b'{"data": "test1"}', 'PartitionKey': '1'},
+                {'Data': b'{"data": "test2"}', 'PartitionKey': '2'}
+            ]
+        )
+        self.assertEqual(len(self.buffer), 0)
+
+    def test_flush_empty(self):
+        self.assertEqual(self.buffer.flush(), [])
+        self.client.put_records.assert_not_called()
+
+    def test_context_flushes(self):
+        with self.buffer as buffer:
+            buffer.add({'data': 'test'}, '1')
+        self.client.put_records.assert_called_once()
+
+    def test_flush_at_record_limit(self):
+        for i in range(KinesisBuffer.MAX_RECORDS + 1):
+            self.buffer.add({'data': i}, str(i))
+        self.client.put_records.assert_called_once()
+        self.assertEqual(
+            len(self.client.put_records.call_args[1]['Records']),
+            KinesisBuffer.MAX_RECORDS
+        )
+        self.assertEqual(len(self.buffer), 1)
+
+    def test_flush_at_size_limit(self):
+        largeRecord = {'data': 'x' * (KinesisBuffer.MAX_RECORD_BYTES - 100)}
+        for i in range(6):
+            self.buffer.add(largeRecord, str(i))
+        self.client.put_records.assert_called_once()
+        self.assertEqual(
+            len(self.client.put_records.call_args[1]['Records']), 5
+        )
+
+    def test_add_oversized_record(self):
+        largeRecord = {'data': 'x' * KinesisBuffer.MAX_RECORD_BYTES}
+        with self.assertRaises(KinesisError):
+            self.buffer.add(largeRecord, '1')
+        self.assertEqual(len(self.buffer), 0)
+
+    def test_retry_failed_entries(self):
+        self.client.put_records.side_effect = [
+            {
+                'FailedRecordCount': 2,
+                'Records': [
+                    {'SequenceNumber': '1', 'ShardId': '1'},
+                    {
+                        'ErrorCode': 'ProvisionedThroughputExceededException',
+                        'ErrorMessage': 'Slow down'
+                    },
+                    {
+                        'ErrorCode': 'KMSAccessDeniedException',
+                        'ErrorMessage': 'Denied'
+                    }
+                ]
+            },
+            {'FailedRecordCount': 0, 'Records': [{}]}
+        ]
+        for i in range(3):
+            self.buffer.add({'data': i}, str(i), tag=i)
+
+        self.assertEqual(self.buffer.flush(), [2])
+        self.assertEqual(self.buffer.failed, [2])
+        retryCall = self.client.put_records.call_args_list[1]
+        self.assertEqual(
+            retryCall[1]['Records'],
+            [{'Data': b'{"data": 1}', 'PartitionKey': '1'}]
+        )
+
+    @patch('lib.outPutManager.time.sleep')
+    def test_retries_exhausted(self, mockSleep):
+        self.buffer.backoff = 0.1
+        self.client.put_records.return_value = {
+            'FailedRecordCount': 1,
+            'Records': [{'ErrorCode': 'InternalFailure'}]
+        }
+        self.buffer.add({'data': 'test'}, '1', tag='a')
+
+        self.assertEqual(self.buffer.flush(), ['a'])
+        self.assertEqual(self.client.put_records.call_count, 3)
+        mockSleep.assert_has_calls([call(0.1), call(0.2)])
+
+    def test_request_error_retried(self):
+        self.client.put_records.side_effect = [
+            botocore.exceptions.ClientError({}, 'put_records'),
+            {'FailedRecordCount': 0, 'Records': [{}]}
+        ]
+        self.buffer.add({'data': 'test'}, '1', tag='a')
+
+        self.assertEqual(self.buffer.flush(), [])
+        self.assertEqual(self.client.put_records.call_count, 2)
+
+    def test_createBuffer(self):
+        buffer = OutputManager.createBuffer('testStream')
+        self.assertEqual(buffer.stream, 'testStream')
+        self.assertEqual(buffer.client, OutputManager.KINESIS_CLIENT)
@@ -2,7 +2,11 @@ from lxml import etree
 import unittest
 from unittest.mock import MagicMock, Mock, patch, DEFAULT
 
-from lib.parsers.parseOCLC import extractHoldingsLinks 
+from lib.parsers.parseOCLC import (
+    extractHoldingsLinks, buildAgent, VIAF_CACHE, resolveAgents,
+    setFieldValue, compileFieldPlan, extractFields, parsePubDate
+)
+from lib.dataModel import InstanceRecord
 from lib.parsers.parse856Holding import HoldingParser
 from lib.dataModel import WorkRecord
 from helpers.errorHelpers import HoldingError
@@ -32,3 +36,147 @@ class TestOCLCParse(unittest.TestCase):
         extractHoldingsLinks([mock_holding], mock_instance)
         parseField.assert_called_once()
         extractBookLinks.assert_not_called()
+
+    @patch('lib.parsers.parseOCLC.requests')
+    def test_buildAgent_viaf_match(self, mockReq):
+        VIAF_CACHE.clear()
+        mockReq.get.return_value.json.return_value = {
+            'name': 'Test Publisher, Inc.', 'viaf': '123', 'lcnaf': 'n456'
+        }
+        agent = buildAgent('Test Publisher', 'publisher')
+        self.assertEqual(agent.name, 'Test Publisher, Inc.')
+        self.assertEqual(agent.aliases, ['Test Publisher'])
+        self.assertEqual(agent.viaf, '123')
+        self.assertEqual(agent.lcnaf, 'n456')
+        self.assertIn('queryType=corporate', mockReq.get.call_args[0][0])
+
+    @patch('lib.parsers.parseOCLC.requests')
+    def test_buildAgent_cached(self, mockReq):
+        VIAF_CACHE.clear()
+        mockReq.get.return_value.json.return_value = {
+            'name': 'Test Publisher', 'viaf': '123', 'lcnaf': None
+        }
+        first = buildAgent('Test Publisher', 'publisher')
+        second = buildAgent('Test Publisher', 'manufacturer')
+        mockReq.get.assert_called_once()
+        self.assertIsNot(first, second)
+        self.assertEqual(second.viaf, '123')
+        self.assertEqual(second.roles, ['manufacturer'])
+
+    @patch('lib.parsers.parseOCLC.requests')
+    def test_buildAgent_negative_cache(self, mockReq):
+        VIAF_CACHE.clear()
+        mockReq.get.return_value.json.return_value = {'message': 'not found'}
+        buildAgent('Unknown Publisher', 'publisher')
+        agent = buildAgent('Unknown Publisher', 'publisher')
+        mockReq.get.assert_called_once()
+        self.assertEqual(agent.name, 'Unknown Publisher')
+        self.assertIsNone(agent.viaf)
+
+    @patch('lib.parsers.parseOCLC.buildAgent')
+    def test_resolveAgents_order(self, mockBuild):
+        mockBuild.side_effect = lambda name, role: (name, role)
+        agents = resolveAgents([
+            ('pub1', 'publisher'),
+            ('pub2', 'publisher'),
+            ('man1', 'manufacturer')
+        ])
+        self.assertEqual(agents, [
+            ('pub1', 'publisher'),
+            ('pub2', 'publisher'),
+            ('man1', 'manufacturer')
+        ])
+
+    @patch('lib.parsers.parseOCLC.buildAgent')
+    def test_resolveAgents_offline(self, mockBuild):
+        agents = resolveAgents([('pub1', 'publisher')], offline=True)
+        mockBuild.assert_not_called()
+        self.assertEqual(agents[0].name, 'pub1')
+        self.assertEqual(agents[0].roles, ['publisher'])
+        self.assertIsNone(agents[0].viaf)
+
+    @patch('lib.parsers.parseOCLC.buildAgent')
+    def test_setFieldValue_queue_agents(self, mockBuild):
+        mockInstance = MagicMock()
+        mockInstance.agents = []
+
+        agentQueue = []
+        setFieldValue(
+            mockInstance, ('260', 'agents', 'b', 'publisher'),
+            'Test Publisher', agentQueue
+        )
+        self.assertEqual(agentQueue, [('Test Publisher', 'publisher')])
+        self.assertEqual(mockInstance.agents, [])
+        mockBuild.assert_not_called()
+
+    def test_compileFieldPlan(self):
+        rules = [
+            ('020', 'identifiers', 'a', 'isbn'),
+            ('245', 'title', 'a'),
+            ('020', 'identifiers', 'z', 'isbn')
+        ]
+        plan = compileFieldPlan(rules)
+        self.assertEqual(plan, [
+            ('020', [(0, rules[0]), (2, rules[2])]),
+            ('245', [(1, rules[1])])
+        ])
+
+    @staticmethod
+    def createField(subfields):
+        field = MagicMock()
+        field.subfields = []
+        for code, value in subfields:
+            subfield = MagicMock()
+            subfield.code = code
+            subfield.value = value
+            field.subfields.append(subfield)
+        return field
+
+    def test_extractFields_rule_order(self):
+        rules = [
+            ('020', 'identifiers', 'a', 'isbn'),
+            ('250', 'edition_statement', 'a'),
+            ('020', 'identifiers', 'z', 'isbn'),
+            ('250', 'edition_statement', 'b')
+        ]
+        fields = {
+            '020': [
+                self.createField([('a', '1'), ('z', '2')]),
+                self.createField([('a', '3'), ('z', '4')])
+            ],
+            '250': [self.createField([('a', '2nd ed.'), ('b', 'revised')])]
+        }
+        instance = InstanceRecord()
+        extractFields(fields, instance, rules, compileFieldPlan(rules))
+        self.assertEqual(
+            [i.identifier for i in instance.identifiers], ['1', '3', '2', '4']
+        )
+        self.assertEqual(instance.edition_statement, '2nd ed.; revised')
+
+    def test_extractFields_missing_subfield(self):
+        rules = [('246', 'alt_titles', 'a')]
+        fields = {
+            '246': [
+                self.createField([('a', 'First')]),
+                self.createField([('i', 'Note')]),
+                self.createField([('a', 'Skipped')])
+            ]
+        }
+        instance = InstanceRecord()
+        extractFields(fields, instance, rules, compileFieldPlan(rules))
+        self.assertEqual(instance.alt_titles, ['First'])
+
+    def test_parsePubDate_existing(self):
+        instance = InstanceRecord()
+        instance.addDate(**{
+            'display_date': '1900', 'date_range': '1900',
+            'date_type': 'pub_date'
+        })
+        parsePubDate('[1900,1901)', instance)
+        self.assertEqual(len(instance.dates), 1)
+        self.assertEqual(instance.dates[0].date_range, '[1900,1901)')
+
+    def test_parsePubDate_new(self):
+        instance = InstanceRecord()
+        parsePubDate('1900', instance)
+        self.assertEqual(instance.getDate('pub_date').date_range, '1900')
@@ -0,0 +1,88 @@
+import json
+import unittest
+from unittest.mock import patch
+
+from helpers.poolHelpers import mapIO
+from lib.parsePool import ParsePool, parseRawRecord, getParseProcesses
+
+TEST_RECORD = (
+    '<record><controlfield tag="001">{0}</controlfield>'
+    '<controlfield tag="008">850101s1923    nyu           000 0 eng d'
+    '</controlfield><datafield tag="245" ind1="1" ind2="0">'
+    '<subfield code="a">Title {0}</subfield></datafield></record>'
+)
+
+
+class TestParsePool(unittest.TestCase):
+    def test_parseRawRecord(self):
+        instance = json.loads(parseRawRecord(TEST_RECORD.format(1)))
+        self.assertEqual(instance['title'], 'Title 1')
+        self.assertEqual(instance['identifiers'][0]['identifier'], '1')
+
+    def test_parseRawRecord_invalid(self):
+        self.assertIsNone(parseRawRecord(b'<record><leader></record>'))
+        self.assertIsNone(parseRawRecord(b'<record></record>'))
+
+    @patch('lib.parsePool.readFromMARC', side_effect=ConnectionError)
+    def test_parseRawRecord_unexpected_error(self, mockRead):
+        self.assertIsNone(parseRawRecord(TEST_RECORD.format(1)))
+
+    @patch('lib.parsers.parse856Holding.requests')
+    @patch('lib.parsers.parseOCLC.requests')
+    def test_parseRawRecord_offline(self, mockVIAFReq, mockHoldingReq):
+        record = TEST_RECORD.format(1).replace('</record>', (
+            '<datafield tag="260" ind1=" " ind2=" ">'
+            '<subfield code="b">Publisher</subfield></datafield>'
+            '<datafield tag="856" ind1="4" ind2="0"><subfield code="u">'
+            'https://catalog.hathitrust.org/api/volumes/oclc/1.html'
+            '</subfield></datafield></record>'
+        ))
+        instance = json.loads(parseRawRecord(record, offline=True))
+        mockVIAFReq.get.assert_not_called()
+        mockHoldingReq.get.assert_not_called()
+        self.assertEqual(instance['agents'][0]['name'], 'Publisher')
+        self.assertEqual(instance['formats'], [])
+
+    def test_pool_ordered(self):
+        records = [TEST_RECORD.format(i).encode('utf-8') for i in range(10)]
+        with ParsePool(2, ordered=True, chunkSize=1) as pool:
+            results = list(pool.parse(records))
+
+        self.assertEqual([r[0] for r in results], list(range(10)))
+        self.assertEqual(json.loads(results[9][1])['title'], 'Title 9')
+
+    def test_pool_unordered(self):
+        records = [TEST_RECORD.format(i) for i in range(10)]
+        with ParsePool(2, ordered=False, chunkSize=1) as pool:
+            results = dict(pool.parse(records))
+
+        self.assertEqual(set(results.keys()), set(range(10)))
+        self.assertEqual(json.loads(results[3])['title'], 'Title 3')
+
+    @patch('lib.parsers.parseOCLC.resolveVIAF', return_value={})
+    def test_pool_after_io_pool_used(self, mockVIAF):
+        mapIO(lambda x: x, range(8), threshold=2)
+        record = TEST_RECORD.format(1).replace('</record>', (
+            '<datafield tag="260" ind1=" " ind2=" ">'
+            '<subfield code="b">Publisher</subfield>'
+            '<subfield code="f">Manufacturer</subfield></datafield></record>'
+        ))
+        with ParsePool(2, chunkSize=1) as pool:
+            result = pool.pool.apply_async(
+                parseRawRecord, (record,)
+            ).get(timeout=10)
+
+        agents = json.loads(result)['agents']
+        self.assertEqual(
+            [agent['name'] for agent in agents], ['Publisher', 'Manufacturer']
+        )
+
+    @patch.dict('os.environ', {'PARSE_PROCESSES': '4'})
+    def test_getParseProcesses(self):
+        self.assertEqual(getParseProcesses(), 4)
+
+    @patch.dict('os.environ', {
+        'PARSE_PROCESSES': '4', 'AWS_LAMBDA_FUNCTION_NAME': 'test'
+    })
+    def test_getParseProcesses_lambda(self):
+        self.assertEqual(getParseProcesses(), 0)
@@ -0,0 +1,34 @@
+import threading
+import unittest
+from unittest.mock import patch
+
+from helpers.poolHelpers import getIOPool, mapIO
+
+
+class TestIOPool(unittest.TestCase):
+    def test_pool_reused(self):
+        self.assertIs(getIOPool(), getIOPool())
+
+    def test_map_preserves_order(self):
+        self.assertEqual(
+            mapIO(lambda x: x * 2, [1, 2, 3, 4], threshold=2),
+            [2, 4, 6, 8]
+        )
+
+    def test_map_below_threshold_runs_inline(self):
+        threads = mapIO(
+            lambda x: threading.current_thread(), [1, 2], threshold=3
+        )
+        self.assertEqual(threads, [threading.current_thread()] * 2)
+
+    def test_map_above_threshold_uses_pool(self):
+        threads = mapIO(
+            lambda x: threading.current_thread().name, [1, 2], threshold=2
+        )
+        for name in threads:
+            self.assertTrue(name.startswith('io-pool'))
+
+    @patch.dict('os.environ', {'IO_POOL_THRESHOLD': '5'})
+    def test_map_threshold_from_env(self):
+        threads = mapIO(lambda x: threading.current_thread(), [1, 2, 3])
+        self.assertEqual(threads, [threading.current_thread()] * 3)
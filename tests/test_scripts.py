@@ -1,20 +1,32 @@
 import unittest
-from unittest.mock import patch, mock_open, call
+from unittest.mock import patch, mock_open, call, MagicMock
 import logging
 from yaml import YAMLError
 import json
+import os
 import sys
+import tempfile
+import yaml
 
 from scripts.lambdaRun import main
+from scripts import benchmarks
+from scripts import bulkIngest
 from helpers.errorHelpers import InvalidExecutionType
-from helpers.configHelpers import setEnvVars, loadEnvFile
-from helpers.clientHelpers import createEventMapping, createAWSClient
+from helpers.configHelpers import (
+    setEnvVars, loadEnvFile, loadConfigFile, CONFIG_CACHE
+)
+from helpers.clientHelpers import (
+    createEventMapping, createAWSClient, getAWSClient, clearAWSClients,
+    AWSClient
+)
 
 # Disable logging while we are running tests
 logging.disable(logging.CRITICAL)
 
 
 class TestScripts(unittest.TestCase):
+    def setUp(self):
+        CONFIG_CACHE.clear()
 
     @patch.object(sys, 'argv', ['make', 'development'])
     @patch('scripts.lambdaRun.setEnvVars')
@@ -134,6 +146,61 @@ class TestScripts(unittest.TestCase):
             pass
         self.assertRaises(IOError)
 
+    @patch.object(sys, 'argv', ['make', 'dump.xml'])
+    @patch('scripts.bulkIngest.ingestMARC')
+    def test_bulk_ingest_stdout(self, mock_ingest):
+        bulkIngest.main()
+        mock_ingest.assert_called_once_with('dump.xml', sys.stdout)
+
+    @patch.object(sys, 'argv', ['make', 'dump.xml', 'out.jsonl'])
+    @patch('scripts.bulkIngest.ingestMARC')
+    def test_bulk_ingest_file(self, mock_ingest):
+        m = mock_open()
+        with patch('builtins.open', m, create=True):
+            bulkIngest.main()
+        m.assert_called_once_with('out.jsonl', 'w')
+        mock_ingest.assert_called_once_with('dump.xml', m())
+
+    @patch.object(sys, 'argv', ['make', 'missing'])
+    def test_benchmark_invalid(self):
+        with self.assertRaises(InvalidExecutionType):
+            benchmarks.main()
+
+    def test_benchmark_classifier(self):
+        results = benchmarks.benchClassifier(number=1)
+        self.assertEqual(
+            set(results.keys()),
+            {'legacy', 'compiled', 'compiled (cached)'}
+        )
+
+    def test_benchmark_serialization(self):
+        results = benchmarks.benchSerialization(number=1)
+        self.assertIn('legacy', results)
+        self.assertIn('default', results)
+        self.assertIn('compact (json)', results)
+
+    def test_measure_data_model(self):
+        results = benchmarks.measureDataModel(count=10, number=1)
+        self.assertEqual(set(results.keys()), {'bytes', 'serialization'})
+        self.assertGreater(results['bytes'], 0)
+
+    def test_benchmark_agents(self):
+        results = benchmarks.benchAgentMerge(agentCount=10)
+        self.assertEqual(set(results.keys()), {'all pairs', 'blocked'})
+
+    def test_benchmark_similarity(self):
+        results = benchmarks.benchSimilarity(nameCount=10)
+        self.assertEqual(set(results.keys()), {'per pair', 'batch'})
+
+    @patch('scripts.benchmarks.subprocess.run')
+    def test_benchmark_imports(self, mock_run):
+        mock_run.return_value.stdout = '0.5\n'
+        results = benchmarks.benchImports(number=2)
+        self.assertEqual(results, {
+            'import service': 0.5, 'import and kinesis client': 0.5
+        })
+        self.assertEqual(mock_run.call_count, 4)
+
     @patch('yaml.load', return_value={'testing': True})
     def test_load_env_success(self, mock_yaml):
         resDict, resLines = loadEnvFile('development', None)
@@ -159,6 +226,45 @@ class TestScripts(unittest.TestCase):
         resDict, resLines = loadEnvFile('development', None)
         self.assertEqual(resDict, {})
 
+    def test_load_config_cached(self):
+        with tempfile.TemporaryDirectory() as tmpDir:
+            configPath = os.path.join(tmpDir, 'test.yaml')
+            with open(configPath, 'w') as configFile:
+                configFile.write('region: test\nfunction_name: tester\n')
+
+            with patch('yaml.load', wraps=yaml.load) as mock_yaml:
+                firstConfig = loadConfigFile(configPath)
+                secondConfig = loadConfigFile(configPath)
+                mock_yaml.assert_called_once()
+
+            self.assertIs(firstConfig, secondConfig)
+            self.assertEqual(
+                firstConfig.data, {'region': 'test', 'function_name': 'tester'}
+            )
+            self.assertEqual(
+                firstConfig.lines, ['region: test\n', 'function_name: tester\n']
+            )
+
+            with open(configPath, 'w') as configFile:
+                configFile.write('region: other\n')
+            os.utime(configPath, (0, 0))
+            self.assertEqual(loadConfigFile(configPath).data['region'], 'other')
+
+    def test_load_env_copy(self):
+        with tempfile.TemporaryDirectory() as tmpDir:
+            configPath = os.path.join(tmpDir, 'development.yaml')
+            with open(configPath, 'w') as configFile:
+                configFile.write('environment_variables:\n  test: value\n')
+
+            configPattern = os.path.join(tmpDir, '{}.yaml')
+            resDict, resLines = loadEnvFile('development', configPattern)
+            resDict['environment_variables']['test'] = 'changed'
+            resLines.append('changed')
+
+            resDict, resLines = loadEnvFile('development', configPattern)
+            self.assertEqual(resDict['environment_variables']['test'], 'value')
+            self.assertEqual(len(resLines), 2)
+
     @patch('yaml.load', side_effect=YAMLError)
     def test_read_env_failure(self, mock_yaml):
         try:
@@ -228,6 +334,23 @@ class TestScripts(unittest.TestCase):
             )
         ])
 
+    @patch('helpers.clientHelpers.createAWSClient')
+    @patch('helpers.clientHelpers.loadEnvFile', side_effect=mockReturns)
+    def test_event_mapping_response_types(self, mock_env, mock_client):
+        jsonD = ('{"EventSourceMappings": [{"EventSourceArn": "test",'
+                 '"Enabled": "test", "BatchSize": "test",'
+                 '"FunctionResponseTypes": ["ReportBatchItemFailures"]}]}')
+        with patch('builtins.open', mock_open(read_data=jsonD), create=True):
+            createEventMapping('development')
+
+        mock_client().create_event_source_mapping.assert_called_once_with(
+            BatchSize='test',
+            Enabled='test',
+            EventSourceArn='test',
+            FunctionName='tester',
+            FunctionResponseTypes=['ReportBatchItemFailures']
+        )
+
     def test_event_mapping_json_err(self):
         jsonD = ('{"EventSourceMappings": [{"EventSourceArn": "test",'
                  '"Enabled": "test", "BatchSize": "test",'
@@ -266,6 +389,39 @@ class TestScripts(unittest.TestCase):
 
         mock_env.assert_not_called()
 
+    @patch('helpers.clientHelpers.createAWSClient')
+    @patch('boto3.session.Session')
+    def test_get_client_cached(self, mock_session, mock_create):
+        clearAWSClients()
+        firstClient = getAWSClient('test_service')
+        secondClient = getAWSClient('test_service')
+        getAWSClient('other_service')
+        clearAWSClients()
+
+        self.assertIs(firstClient, secondClient)
+        mock_session.assert_called_once()
+        mock_create.assert_has_calls([
+            call('test_service', session=mock_session()),
+            call('other_service', session=mock_session())
+        ])
+
+    @patch('helpers.clientHelpers.getAWSClient', return_value='client')
+    def test_client_descriptor(self, mock_get):
+        class TestClass:
+            CLIENT = AWSClient('test_service')
+
+        mock_get.assert_not_called()
+        self.assertEqual(TestClass.CLIENT, 'client')
+        self.assertEqual(TestClass().CLIENT, 'client')
+        mock_get.assert_called_with('test_service')
+
+    def test_create_client_session(self):
+        mockSession = MagicMock()
+        createAWSClient('test_service', {'region': 'test'}, mockSession)
+        mockSession.client.assert_called_once_with(
+            'test_service', region_name='test'
+        )
+
     @patch('boto3.client', return_value=True)
     def test_create_client(self, mock_boto):
         result = createAWSClient('test_service', {
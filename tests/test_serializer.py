@@ -0,0 +1,127 @@
+import json
+import os
+import subprocess
+import sys
+import unittest
+from unittest.mock import patch
+
+from lib.dataModel import (
+    InstanceRecord, Link, Identifier, Agent, Date, SlottedDataObject
+)
+from lib import serializer
+from scripts.benchmarks import createBenchInstance
+from lib.serializer import (
+    serializeObject, toJSONStdlib, toJSONCompactStdlib, toJSONOrjson,
+    getFormat, getSerializer, createSerializer
+)
+
+
+class TestSerializer(unittest.TestCase):
+    def setUp(self):
+        self.instance = InstanceRecord(title='Tést Title', language='eng')
+        self.instance.addFormat(**{
+            'source': 'hathitrust',
+            'content_type': 'ebook',
+            'links': [
+                Link(url='http://test.com/1', mediaType='text/html', flags={
+                    'local': False, 'download': False
+                })
+            ],
+            'identifiers': [Identifier(identifier='1', source='hathi')]
+        })
+        self.instance.addIdentifier(type='oclc', identifier='1', weight=0.8)
+        self.instance.agents.append(Agent(name='Author', role='author'))
+        self.instance.dates.append(Date(displayDate='1900', dateType='pub'))
+        self.instance['table_of_contents'] = 'Part 1: "Tést", \\ Part 2\x1f'
+        self.instance.formats[0].links[0].flags[1] = {'pages': 12}
+        self.outputObject = {
+            'type': 'instance', 'method': 'update', 'data': self.instance
+        }
+
+    def test_stdlib_output(self):
+        testDate = Date(displayDate='1900', dateType='pub')
+        testDate['source'] = 'test'
+        self.assertEqual(
+            toJSONStdlib({'data': [testDate], 'title': 'Tést'}),
+            '{"data": [{"display_date": "1900", "date_range": null, '
+            '"date_type": "pub", "source": "test"}], "title": "Tést"}'
+        )
+
+    def test_stdlib_matches_dumps(self):
+        self.assertEqual(
+            toJSONStdlib(self.outputObject),
+            json.dumps(
+                self.outputObject, ensure_ascii=False,
+                default=lambda x: x.getDictValue()
+            )
+        )
+
+    def test_orjson_matches_compact(self):
+        if serializer.orjson is None:
+            self.skipTest('orjson is not installed')
+
+        self.assertEqual(
+            toJSONOrjson(self.outputObject),
+            toJSONCompactStdlib(self.outputObject)
+        )
+        self.assertEqual(
+            json.loads(toJSONOrjson(self.outputObject)),
+            json.loads(toJSONStdlib(self.outputObject))
+        )
+
+    def test_createSerializer_dict(self):
+        self.assertIs(createSerializer(Identifier), vars)
+
+    def test_createSerializer_slotted(self):
+        class SlottedRecord(SlottedDataObject):
+            __slots__ = ('type', 'identifier')
+
+        testRecord = SlottedRecord.createFromDict(type='oclc', source='test')
+        testRecord['identifier'] = '1'
+        serializeRecord = createSerializer(SlottedRecord)
+        self.assertEqual(
+            list(serializeRecord(testRecord).items()),
+            list(testRecord.getDictValue().items())
+        )
+
+    def test_slotted_model_output(self):
+        slottedRun = subprocess.run(
+            [
+                sys.executable, '-c',
+                'import sys\n'
+                'from lib.serializer import toJSONStdlib\n'
+                'from scripts.benchmarks import createBenchInstance\n'
+                'sys.stdout.write(toJSONStdlib(createBenchInstance(10)))\n'
+            ],
+            stdout=subprocess.PIPE, universal_newlines=True, check=True,
+            env=dict(os.environ, DATA_MODEL='slotted')
+        )
+        self.assertEqual(
+            slottedRun.stdout, toJSONStdlib(createBenchInstance(10))
+        )
+
+    def test_serializeObject_model(self):
+        self.assertEqual(
+            serializeObject(self.instance.identifiers[0]),
+            {'type': 'oclc', 'identifier': '1', 'weight': 0.8}
+        )
+
+    def test_serializeObject_other(self):
+        class TestObject:
+            def __init__(self):
+                self.test = 'value'
+
+        self.assertEqual(serializeObject(TestObject()), {'test': 'value'})
+
+    def test_getFormat_default(self):
+        self.assertEqual(getFormat(), 'default')
+        self.assertIs(getSerializer(), toJSONStdlib)
+
+    @patch.dict('os.environ', {'JSON_FORMAT': 'other'})
+    def test_getFormat_unknown(self):
+        self.assertEqual(getFormat(), 'default')
+
+    @patch.dict('os.environ', {'JSON_FORMAT': 'compact'})
+    @patch('lib.serializer.orjson', None)
+    def test_getSerializer_compact_missing_orjson(self):
+        self.assertIs(getSerializer(), toJSONCompactStdlib)